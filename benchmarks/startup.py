@@ -0,0 +1,137 @@
+"""Startup benchmark for the target-elasticsearch CLI.
+
+Measures, in fresh interpreters:
+
+1. cumulative import time of `target_elasticsearch.target`, `target_elasticsearch.sinks`
+   and their heavy dependencies (via `python -X importtime`), noting the ones the
+   SDK imports anyway,
+2. wall time of `target-elasticsearch --about`,
+3. wall time of a run with empty input,
+4. time to first record: a run with a single SCHEMA/RECORD pair, which needs a
+   reachable cluster (use `--config` to point at one).
+
+Usage:
+    python benchmarks/startup.py [--repeat N] [--config CONFIG]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CLI = "from target_elasticsearch.target import TargetElasticsearch; TargetElasticsearch.cli()"
+WATCHED_MODULES = (
+    "target_elasticsearch.target",
+    "target_elasticsearch.sinks",
+    "elasticsearch",
+    "singer_sdk",
+    "jinja2",
+    "jsonpath_ng",
+    "dateutil",
+)
+
+SINGLE_RECORD_INPUT = "\n".join(
+    json.dumps(message)
+    for message in (
+        {
+            "type": "SCHEMA",
+            "stream": "startup_benchmark",
+            "schema": {"properties": {"id": {"type": "string"}}},
+            "key_properties": ["id"],
+        },
+        {"type": "RECORD", "stream": "startup_benchmark", "record": {"id": "1"}},
+    )
+)
+
+
+def _run(args: list[str], stdin: str = "") -> float:
+    """Run the target CLI in a fresh interpreter and return its wall time in seconds."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", CLI, *args],
+        input=stdin,
+        text=True,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def _import_times() -> dict[str, float]:
+    """Return cumulative import time in milliseconds for the watched modules."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import target_elasticsearch.target"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line.partition("import time:")[2]
+        _, cumulative, name = (part.strip() for part in fields.split("|"))
+        if name in WATCHED_MODULES:
+            times[name] = int(cumulative) / 1000
+    return times
+
+
+def _loaded_by_sdk(module: str) -> bool:
+    """Return whether importing the SDK's sink classes already imports `module`."""
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, singer_sdk.sinks; print({module!r} in sys.modules)"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip() == "True"
+
+
+def _report(label: str, samples: list[float]) -> None:
+    print(
+        f"{label:<28} median {statistics.median(samples) * 1000:8.1f} ms"
+        f"   min {min(samples) * 1000:8.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement")
+    parser.add_argument("--config", help="target config file, defaults to a local cluster")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = args.config
+        if config is None:
+            config = os.path.join(tmp, "config.json")
+            with open(config, "w") as f:
+                json.dump({}, f)
+
+        print("Import time (cumulative, first run):")
+        for name, ms in sorted(_import_times().items(), key=lambda item: -item[1]):
+            print(f"  {name:<28} {ms:8.1f} ms")
+        for name in ("jinja2", "jsonpath_ng"):
+            if _loaded_by_sdk(name):
+                print(f"  note: {name} is imported by singer_sdk, deferring it saves nothing")
+        print()
+
+        _report("--about", [_run(["--about"]) for _ in range(args.repeat)])
+        _report("empty input", [_run(["--config", config]) for _ in range(args.repeat)])
+        try:
+            samples = [
+                _run(["--config", config], stdin=SINGLE_RECORD_INPUT) for _ in range(args.repeat)
+            ]
+        except subprocess.CalledProcessError:
+            print(f"{'time to first record':<28} skipped, no reachable cluster for {config}")
+        else:
+            _report("time to first record", samples)
+
+
+if __name__ == "__main__":
+    main()
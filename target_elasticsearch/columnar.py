@@ -0,0 +1,273 @@
+"""Column-wise preparation of bulk actions for BATCH message files with pyarrow.
+
+BATCH files are read into Arrow record batches holding only the columns that
+index names and simple `metadata_fields` are computed from; these are computed
+per column instead of per record: index schema
+fields are reduced to their distinct values (timestamps truncated to the day
+when they are only used through `to_daily`/`to_monthly`/`to_yearly`), the index
+template is rendered once per distinct value, and the result is mapped back onto
+the rows. Each document's `_source` is the record as the SDK would parse it, so
+the documents match those of the record path. This module requires the optional
+`pyarrow` dependency.
+"""
+
+import gzip
+import json
+import re
+
+from typing import IO, Any, Callable, Iterator, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet
+
+# JSONPath expressions that select a top-level field, e.g. `id` or `$.id`.
+SIMPLE_PATH = re.compile(r"^(?:\$\.)?([A-Za-z_][A-Za-z0-9_]*)$")
+ISO_DATE_PREFIX = r"^\d{4}-\d{2}-\d{2}"
+DATE_HELPERS = ("to_daily", "to_monthly", "to_yearly")
+# Joins the values of several index schema fields into a single key column.
+KEY_SEPARATOR = "\x1f"
+
+
+def simple_field(path: str) -> Optional[str]:
+    """Return the top-level field selected by a JSONPath expression, if that is all it does.
+
+    Args:
+        path: JSONPath expression from `metadata_fields` or `index_schema_fields`.
+
+    Returns:
+        Field name, or None for any other expression.
+    """
+    match = SIMPLE_PATH.match(path)
+    return match.group(1) if match else None
+
+
+def date_helper_only_fields(index_format: str, names: list[str]) -> set[str]:
+    """Return the template variables only used as argument of a date helper.
+
+    Such variables only matter up to their date, so they can be truncated to the
+    day before computing distinct values.
+
+    Args:
+        index_format: Jinja template of the index name.
+        names: Template variables defined by `index_schema_fields`.
+
+    Returns:
+        Names only ever used as `to_daily(name)`, `to_monthly(name)` or `to_yearly(name)`.
+    """
+    helpers = "|".join(DATE_HELPERS)
+    fields = set()
+    for name in names:
+        uses = len(re.findall(rf"\b{re.escape(name)}\b", index_format))
+        helper_uses = len(re.findall(rf"\b(?:{helpers})\(\s*{re.escape(name)}\s*\)", index_format))
+        if uses and uses == helper_uses:
+            fields.add(name)
+    return fields
+
+
+def read_record_batches(
+    file: IO[bytes],
+    file_format: str,
+    compression: Optional[str],
+    fields: list[str],
+    batch_size: int,
+    loads: Callable[[bytes], dict] = json.loads,
+) -> Iterator[tuple[Optional[pa.RecordBatch], list[dict]]]:
+    """Read a BATCH file as record batches of the given columns along with their records.
+
+    JSONL lines are parsed into records with `loads`, and only the columns in
+    `fields` are built from them, so other fields may hold any JSON value. A
+    column whose values Arrow cannot hold in one array (e.g. numbers and strings
+    mixed) yields no batch, leaving its records to the record path.
+
+    Args:
+        file: Open binary file.
+        file_format: `jsonl` or `parquet`.
+        compression: `gzip` or None for JSONL files.
+        fields: Top-level fields used by `index_schema_fields` and `metadata_fields`.
+        batch_size: Maximum rows per record batch.
+        loads: Parses a JSONL line into a record.
+
+    Yields:
+        Tuples of a record batch of at most `batch_size` rows, or None, and its records.
+    """
+    if file_format == "parquet":
+        for batch in pyarrow.parquet.ParquetFile(file).iter_batches(batch_size=batch_size):
+            yield batch, batch.to_pylist()
+        return
+    data = file.read()
+    if compression == "gzip":
+        data = gzip.decompress(data)
+    lines = [line for line in data.splitlines() if line.strip()]
+    for start in range(0, len(lines), batch_size):
+        end = start + batch_size
+        sources = [loads(line) for line in lines[start:end]]
+        yield _columns_batch(sources, fields), sources
+
+
+def _columns_batch(sources: list[dict], fields: list[str]) -> Optional[pa.RecordBatch]:
+    """Build a record batch of the given top-level fields of the records.
+
+    Args:
+        sources: Parsed records.
+        fields: Top-level field names.
+
+    Returns:
+        Record batch, or None if the values of a field do not fit a single Arrow type.
+    """
+    arrays = []
+    for field in fields:
+        try:
+            array = pa.array([source.get(field) for source in sources])
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return None
+        # Keep fields that are null or missing in every record templatable.
+        arrays.append(
+            pa.nulls(len(sources), pa.string()) if pa.types.is_null(array.type) else array
+        )
+    return pa.RecordBatch.from_arrays(arrays, names=fields)
+
+
+def _template_value_column(column: pa.Array, truncate_to_day: bool) -> pa.Array:
+    """Convert a column to the string form its values take in the index template."""
+    if truncate_to_day and pa.types.is_timestamp(column.type):
+        return pc.strftime(column, format="%Y-%m-%d")
+    if truncate_to_day and pa.types.is_string(column.type):
+        # `to_daily` only looks at the date, which leads ISO 8601 strings.
+        if pc.all(pc.match_substring_regex(column, ISO_DATE_PREFIX)).as_py() is not False:
+            return pc.utf8_slice_codeunits(column, 0, 10)
+    return pc.cast(column, pa.string())
+
+
+def _supports_template_column(column_type: pa.DataType, truncate_to_day: bool) -> bool:
+    """Return whether values of this type render the same column-wise as per record."""
+    if pa.types.is_string(column_type) or pa.types.is_integer(column_type):
+        return True
+    return truncate_to_day and (pa.types.is_timestamp(column_type) or pa.types.is_date(column_type))
+
+
+def _absent(column: pa.Array, field: str, sources: Optional[list[dict]]) -> Optional[pa.Array]:
+    """Return a mask of the rows whose record does not have `field` at all.
+
+    The record path templates a missing field as its literal path but an explicit
+    null as None; in a column both are null, so the records tell them apart.
+
+    Args:
+        column: Column of the field.
+        field: Top-level field name.
+        sources: Records of the batch, if known.
+
+    Returns:
+        Boolean mask, or None when no row of the column is null.
+    """
+    if sources is None or column.null_count == 0:
+        return None
+    return pa.array([field not in source for source in sources], pa.bool_())
+
+
+def supports_index_columns(
+    schema: pa.Schema, fields: dict[str, str], truncate_to_day: set[str]
+) -> bool:
+    """Return whether the index of a record batch with this schema can be computed column-wise.
+
+    Args:
+        schema: Arrow schema of the record batch.
+        fields: `index_schema_fields` of the stream, selecting top-level fields only.
+        truncate_to_day: Template variables only used through date helpers.
+
+    Returns:
+        False if a field has a type, such as a nested object, rendered differently per record.
+    """
+    for name, path in fields.items():
+        field = simple_field(path)
+        if field in schema.names and not _supports_template_column(
+            schema.field(field).type, name in truncate_to_day
+        ):
+            return False
+    return True
+
+
+def index_column(
+    batch: pa.RecordBatch,
+    fields: dict[str, str],
+    truncate_to_day: set[str],
+    render: Callable[[dict[str, Any]], str],
+    sources: Optional[list[dict]] = None,
+) -> tuple[list[str], set[str]]:
+    """Compute the index of every row, rendering the template once per distinct value.
+
+    Args:
+        batch: Record batch to index.
+        fields: `index_schema_fields` of the stream, selecting top-level fields only.
+        truncate_to_day: Template variables only used through date helpers.
+        render: Renders the index name from template variables.
+        sources: Records of the batch, telling missing fields from explicit nulls.
+
+    Returns:
+        Tuple containing the index of each row and the set of distinct indices.
+    """
+    names = batch.schema.names
+    columns = []
+    for name, path in fields.items():
+        field = simple_field(path)
+        if field in names:
+            values = batch.column(field)
+            column = pc.fill_null(_template_value_column(values, name in truncate_to_day), "None")
+            absent = _absent(values, field, sources)
+            if absent is not None:
+                column = pc.if_else(absent, path, column)
+            columns.append(column)
+        else:
+            # Like the record path, a missing field is templated as the literal path.
+            columns.append(pa.array([path] * batch.num_rows, pa.string()))
+    if len(columns) == 1:
+        key = columns[0]
+    else:
+        key = pc.binary_join_element_wise(*columns, KEY_SEPARATOR)
+    encoded = pc.dictionary_encode(key)
+    rendered = [
+        render(dict(zip(fields, value.split(KEY_SEPARATOR) if len(columns) > 1 else [value])))
+        for value in encoded.dictionary.to_pylist()
+    ]
+    indices = pa.array(rendered, pa.string()).take(encoded.indices).to_pylist()
+    return indices, set(rendered)
+
+
+def metadata_columns(
+    batch: pa.RecordBatch, fields: dict[str, str], sources: Optional[list[dict]] = None
+) -> dict[str, list[Any]]:
+    """Pick the `metadata_fields` values of every row straight from their columns.
+
+    Columns of other types than strings and integers may hold values that differ
+    from the parsed records (e.g. timestamps inferred from strings), so their
+    values are taken from the records when these are known.
+
+    Args:
+        batch: Record batch to index.
+        fields: `metadata_fields` of the stream, selecting top-level fields only.
+        sources: Records of the batch, telling missing fields from explicit nulls.
+
+    Returns:
+        Values of each metadata key, one per row.
+    """
+    names = batch.schema.names
+    columns = {}
+    for key, path in fields.items():
+        field = simple_field(path)
+        if field not in names:
+            # Like the record path, a missing field yields the literal path.
+            columns[key] = [path] * batch.num_rows
+            continue
+        column = batch.column(field)
+        if sources is not None and not (
+            pa.types.is_string(column.type) or pa.types.is_integer(column.type)
+        ):
+            columns[key] = [source.get(field, path) for source in sources]
+            continue
+        values = column.to_pylist()
+        absent = _absent(column, field, sources)
+        if absent is not None:
+            for row in pc.indices_nonzero(absent).to_pylist():
+                values[row] = path
+        columns[key] = values
+    return columns
@@ -0,0 +1,98 @@
+"""Persistent index of document content hashes used to skip unchanged documents.
+
+Each document is keyed on its `_index` and `_id`; its hash is a digest of the
+canonical JSON of its `_source`. Documents whose hash matches the stored one
+were already indexed with the same content and can be left out of the bulk body.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+
+from typing import Any
+
+# SQLite limits the number of bound parameters per statement.
+LOOKUP_CHUNK_SIZE = 500
+
+
+def content_hash(source: Any) -> bytes:
+    """Return a stable digest of a document's `_source`.
+
+    Args:
+        source: Document body.
+
+    Returns:
+        16-byte digest, independent of key order.
+    """
+    canonical = json.dumps(source, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).digest()
+
+
+class ContentHashIndex:
+    """SQLite backed map of (`_index`, `_id`) to the hash of the last indexed `_source`.
+
+    Several sinks may open the same file; WAL mode lets them read and write concurrently.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " index_name TEXT NOT NULL,"
+                " document_id TEXT NOT NULL,"
+                " hash BLOB NOT NULL,"
+                " PRIMARY KEY (index_name, document_id)"
+                ") WITHOUT ROWID"
+            )
+
+    def changed(self, index: str, hashes: dict[str, bytes]) -> dict[str, bytes]:
+        """Return the documents whose hash differs from the stored one.
+
+        Args:
+            index: Index the documents belong to.
+            hashes: Content hash of each document, keyed on `_id`.
+
+        Returns:
+            The subset of `hashes` that is new or changed.
+        """
+        ids = list(hashes)
+        stored = {}
+        with self._lock:
+            for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+                end = start + LOOKUP_CHUNK_SIZE
+                chunk = ids[start:end]
+                rows = self._connection.execute(
+                    "SELECT document_id, hash FROM documents WHERE index_name = ?"
+                    f" AND document_id IN ({','.join('?' * len(chunk))})",
+                    [index, *chunk],
+                )
+                stored.update(rows)
+        return {
+            document_id: digest
+            for document_id, digest in hashes.items()
+            if stored.get(document_id) != digest
+        }
+
+    def update(self, index: str, hashes: dict[str, bytes]) -> None:
+        """Store the hashes of documents that were indexed successfully.
+
+        Args:
+            index: Index the documents belong to.
+            hashes: Content hash of each document, keyed on `_id`.
+        """
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO documents (index_name, document_id, hash) VALUES (?, ?, ?)",
+                [(index, document_id, digest) for document_id, digest in hashes.items()],
+            )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
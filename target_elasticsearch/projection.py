@@ -0,0 +1,153 @@
+"""Per-stream field projection applied to records while bulk actions are built.
+
+A projection spec is compiled once per sink into a single function, so stripping
+fields costs one pass over each record, fused with building its bulk action:
+
+    {
+        "include": ["id", "user"],      # keep only these fields
+        "exclude": ["user.password"],   # drop these fields
+        "rename": {"user.name": "name"},
+        "flatten": true,                # nested objects become dotted keys
+        "flatten_separator": ".",
+        "drop_nulls": true,             # drop fields whose value is null
+    }
+
+Field names in `include`, `exclude` and `rename` refer to top-level keys, or to
+flattened keys when `flatten` is enabled. Including or excluding a flattened
+prefix such as `user` applies to every key below it.
+"""
+
+from typing import Any, Callable, Optional
+
+PROJECTION_KEYS = {"include", "exclude", "rename", "flatten", "flatten_separator", "drop_nulls"}
+
+Projection = Callable[[dict], dict]
+
+
+def compile_projection(spec: Optional[dict]) -> Optional[Projection]:
+    """Compile a projection spec into a function mapping a record to its `_source`.
+
+    Args:
+        spec: Projection configuration for a stream.
+
+    Returns:
+        Projection function, or None if the spec leaves records unchanged.
+
+    Raises:
+        ValueError: If the spec contains unknown keys or options of the wrong type.
+    """
+    if not spec:
+        return None
+    unknown = set(spec) - PROJECTION_KEYS
+    if unknown:
+        raise ValueError(f"unknown field projection options: {sorted(unknown)}")
+    for option in ("include", "exclude"):
+        fields = spec.get(option)
+        # A bare string would silently become the set of its characters.
+        if fields is not None and not (
+            isinstance(fields, (list, tuple)) and all(isinstance(field, str) for field in fields)
+        ):
+            raise ValueError(f"field projection option {option!r} must be a list of field names")
+    rename = spec.get("rename")
+    if rename is not None and not (
+        isinstance(rename, dict)
+        and all(isinstance(key, str) and isinstance(value, str) for key, value in rename.items())
+    ):
+        raise ValueError("field projection option 'rename' must map field names to field names")
+
+    include = frozenset(spec["include"]) if spec.get("include") is not None else None
+    exclude = frozenset(spec.get("exclude") or ())
+    rename = dict(spec.get("rename") or {})
+    drop_nulls = bool(spec.get("drop_nulls"))
+
+    if spec.get("flatten"):
+        separator = spec.get("flatten_separator") or "."
+        return _compile_flattening(include, exclude, rename, drop_nulls, separator)
+
+    if include is not None:
+        # Look up the wanted keys directly rather than scanning wide records.
+        fields = [key for key in spec["include"] if key not in exclude]
+
+        def project_included(record: dict) -> dict:
+            return {
+                rename.get(key, key): record[key]
+                for key in fields
+                if key in record and not (drop_nulls and record[key] is None)
+            }
+
+        return project_included
+
+    if not (exclude or rename or drop_nulls):
+        return None
+
+    def project(record: dict) -> dict:
+        return {
+            rename.get(key, key): value
+            for key, value in record.items()
+            if key not in exclude and not (drop_nulls and value is None)
+        }
+
+    return project
+
+
+def _compile_flattening(
+    include: Optional[frozenset],
+    exclude: frozenset,
+    rename: dict,
+    drop_nulls: bool,
+    separator: str,
+) -> Projection:
+    """Compile a projection that flattens nested objects into separator-joined keys.
+
+    Args:
+        include: Flattened keys or prefixes to keep, everything when None.
+        exclude: Flattened keys or prefixes to drop.
+        rename: Mapping of flattened keys to their output names.
+        drop_nulls: Whether to drop null values.
+        separator: String joining the keys of nested objects.
+
+    Returns:
+        Projection function.
+    """
+
+    def matches(key: str, fields: frozenset) -> bool:
+        """Return whether `key` or one of its parents is in `fields`."""
+        if key in fields:
+            return True
+        position = key.find(separator)
+        while position != -1:
+            if key[:position] in fields:
+                return True
+            position = key.find(separator, position + len(separator))
+        return False
+
+    # Parents of included keys must be descended into even though they are not kept whole.
+    include_parents = frozenset(
+        field[:position]
+        for field in include or ()
+        for position in range(len(field))
+        if field.startswith(separator, position)
+    )
+
+    def flatten_into(out: dict, record: dict, prefix: str) -> None:
+        for key, value in record.items():
+            key = prefix + key
+            if exclude and matches(key, exclude):
+                continue
+            if include is not None and key not in include_parents and not matches(key, include):
+                continue
+            if isinstance(value, dict) and value:
+                flatten_into(out, value, key + separator)
+                continue
+            if drop_nulls and value is None:
+                continue
+            if include is not None and not matches(key, include):
+                continue
+            out[rename.get(key, key)] = value
+
+    def project(record: dict) -> dict:
+        out: dict[str, Any] = {}
+        flatten_into(out, record, "")
+        return out
+
+    return project
@@ -1,22 +1,128 @@
 import elasticsearch
 import elasticsearch.helpers
-import jinja2
+import functools
+import json
+import os
+import queue
 import re
+import threading
+import time
 
-from typing import Optional, Union, Any, Tuple, Set
+from typing import Optional, Union, Any, Callable, Tuple, Set, Sequence
 
-import jsonpath_ng
-from dateutil.parser import parse
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import bulk, expand_action
+from elasticsearch.serializer import JSONSerializer
 from singer_sdk import Target
+from singer_sdk.helpers._batch import BaseBatchFileEncoding, StorageTarget
 from singer_sdk.sinks import BatchSink
 
+from target_elasticsearch.content_hash import ContentHashIndex, content_hash
+from target_elasticsearch.projection import compile_projection
+from target_elasticsearch.spool import SEGMENT_BYTES_DEFAULT, DiskSpool
+
 import datetime
 
 ELASTIC_YEARLY_FORMAT = "%Y"
 ELASTIC_MONTHLY_FORMAT = "%Y.%m"
 ELASTIC_DAILY_FORMAT = "%Y.%m.%d"
 
+_SERIALIZER = JSONSerializer()
+
+# Sentinel pushed onto a sink's drain queue to stop its worker thread.
+_STOP_WORKER = object()
+
+
+def _parse_jsonpath(path: str) -> Any:
+    """Compile a JSONPath expression, importing jsonpath_ng on first use.
+
+    Args:
+        path: JSONPath expression to compile.
+
+    Returns:
+        Compiled JSONPath expression.
+    """
+    import jsonpath_ng
+
+    return jsonpath_ng.parse(path)
+
+
+def _date_formatter(date_format: str) -> Any:
+    """Build an index template helper formatting a date string with `date_format`.
+
+    Args:
+        date_format: strftime format applied to the parsed date.
+
+    Returns:
+        Function formatting a date string for use in index names.
+    """
+
+    def _format(date: str) -> str:
+        from dateutil.parser import parse
+
+        return parse(date).date().strftime(date_format)
+
+    return _format
+
+
+class InflightBytesBudget:
+    """Global cap on bulk request bytes in flight across all sinks of a target.
+
+    A request larger than the whole budget is still let through once nothing else
+    is in flight, so an oversized batch can never deadlock the workers.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size: int) -> None:
+        """Block until `size` bytes fit in the budget, then reserve them.
+
+        Args:
+            size: Number of bytes about to be sent.
+        """
+        with self._condition:
+            while self._in_flight and self._in_flight + size > self.max_bytes:
+                self._condition.wait()
+            self._in_flight += size
+
+    def release(self, size: int) -> None:
+        """Return `size` previously acquired bytes to the budget.
+
+        Args:
+            size: Number of bytes that finished sending.
+        """
+        with self._condition:
+            self._in_flight -= size
+            self._condition.notify_all()
+
+
+class FlushDeadline:
+    """Deadline shared by all sinks of a target for draining their spools at the end of a run.
+
+    The clock starts when the first sink begins waiting, so sinks cleaned up one
+    after another together wait at most `timeout` seconds.
+    """
+
+    def __init__(self, timeout: Optional[float]):
+        self.timeout = timeout
+        self._deadline: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def remaining(self) -> Optional[float]:
+        """Start the clock on first use and return the seconds left.
+
+        Returns:
+            Seconds left before the deadline, or None to wait forever.
+        """
+        if self.timeout is None:
+            return None
+        with self._lock:
+            if self._deadline is None:
+                self._deadline = time.monotonic() + self.timeout
+            return max(self._deadline - time.monotonic(), 0.0)
+
 
 class ElasticSink(BatchSink):
     """Elasticsearch target sink class for batch processing records."""
@@ -31,19 +137,63 @@ class ElasticSink(BatchSink):
         key_properties: Optional[list[str]],
     ):
         super().__init__(target, stream_name, schema, key_properties)
-        self.client = self._authenticated_client()
+        self._client: Optional[elasticsearch.Elasticsearch] = None
+        self._client_lock = threading.Lock()
+        self._index_template = None
+        self._index_ready = False
         self.index_schema_fields = self.config.get("index_schema_fields", {}).get(
             self.stream_name, {}
         )
         self.metadata_fields = self.config.get("metadata_fields", {}).get(self.stream_name, {})
         self.index_mappings = self.config.get("index_mappings", {}).get(self.stream_name, {})
         self.index_name = None
+        self.projection = compile_projection(
+            (self.config.get("field_projections") or {}).get(self.stream_name)
+        )
         self.compiled_metadata_fields = {
-            k: jsonpath_ng.parse(v) for k, v in (self.metadata_fields or {}).items()
+            k: _parse_jsonpath(v) for k, v in (self.metadata_fields or {}).items()
         }
         self.compiled_index_schema_fields = {
-            k: jsonpath_ng.parse(v) for k, v in (self.index_schema_fields or {}).items()
+            k: _parse_jsonpath(v) for k, v in (self.index_schema_fields or {}).items()
         }
+        self._drain_queue: Optional[queue.Queue] = None
+        self._drain_worker: Optional[threading.Thread] = None
+        self._drain_error: Optional[BaseException] = None
+        # Shared by every sink of the target, also when the SDK drains them in parallel.
+        budget = getattr(target, "inflight_budget", None)
+        self._inflight_budget: Optional[InflightBytesBudget] = (
+            budget if isinstance(budget, InflightBytesBudget) else None
+        )
+        if self.config.get("concurrent_sinks"):
+            self._start_drain_worker()
+        self._content_hashes: Optional[ContentHashIndex] = None
+        if self.config.get("content_hash_db"):
+            self._content_hashes = ContentHashIndex(self.config["content_hash_db"])
+            if "current_timestamp_" in (self.config.get("index_format") or ""):
+                self.logger.warning(
+                    f"content_hash_db is set but index_format of {self.stream_name} uses "
+                    "current_timestamp_*: hashes are keyed on the index, so documents sent "
+                    "to a new dated index are never skipped and the hash database keeps growing"
+                )
+        self._spool: Optional[DiskSpool] = None
+        deadline = getattr(target, "spool_flush_deadline", None)
+        self._flush_deadline = (
+            deadline
+            if isinstance(deadline, FlushDeadline)
+            else FlushDeadline(self.config.get("spool_flush_timeout"))
+        )
+        self._spooled_indices: Set[str] = set()
+        if self.config.get("spool_dir"):
+            self._spool = DiskSpool(
+                os.path.join(
+                    self.config["spool_dir"], re.sub(r"[^A-Za-z0-9_.-]+", "_", self.stream_name)
+                ),
+                self._send_spooled,
+                segment_bytes=self.config.get("spool_segment_bytes") or SEGMENT_BYTES_DEFAULT,
+                logger=self.logger,
+                retryable=self._retryable_spool_error,
+            )
+            self._spool.start()
 
     def setup(self) -> None:
         """Perform any setup actions at the beginning of a Stream.
@@ -52,9 +202,149 @@ class ElasticSink(BatchSink):
         change is detected, a new Sink is instantiated and this method is called again.
         """
         self.logger.info("Setting up %s", self.stream_name)
+
+    @property
+    def client(self) -> elasticsearch.Elasticsearch:
+        """Return the Elasticsearch client, connecting on first use.
+
+        Returns:
+            Configured Elasticsearch client instance.
+        """
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._authenticated_client()
+        return self._client
+
+    def process_record(self, record: dict, context: dict) -> None:
+        """Prepare the stream's index on the first record, then queue the record.
+
+        Index setup is deferred until here so streams that receive no records
+        never connect to the cluster. When spooling, the index is created by the
+        spool drainer instead so an unavailable cluster does not stall ingestion.
+
+        Args:
+            record: Individual record in the stream.
+            context: Stream partition or context dictionary.
+        """
+        if not self._index_ready:
+            self._prepare_index()
+        super().process_record(record, context)
+
+    def _prepare_index(self) -> None:
+        """Template and create the stream's static index, if it has one."""
+        self._index_ready = True
         if not self.index_schema_fields:
             self.index_name = self._template_index()
-            self.create_index(self.index_name)
+            if self._spool is None:
+                self.create_index(self.index_name)
+
+    def process_batch_files(self, encoding: BaseBatchFileEncoding, files: Sequence[str]) -> None:
+        """Process the files of a BATCH message.
+
+        With `columnar_batch_files` enabled, JSONL and Parquet files are read
+        column-wise with pyarrow and index names and metadata fields are computed
+        per column; otherwise files are handled record by record by the SDK.
+
+        Args:
+            encoding: The batch file encoding.
+            files: The batch files to process.
+        """
+        if not self._columnar_batch_files_supported(encoding):
+            super().process_batch_files(encoding, files)
+            return
+        from singer_sdk.singerlib.json import deserialize_json
+
+        from target_elasticsearch import columnar
+
+        if not self._index_ready:
+            self._prepare_index()
+        truncate_to_day = columnar.date_helper_only_fields(
+            self.config["index_format"], list(self.index_schema_fields or {})
+        )
+        paths = [*(self.metadata_fields or {}).values(), *(self.index_schema_fields or {}).values()]
+        fields = list(dict.fromkeys(columnar.simple_field(path) for path in paths))
+        storage = self.batch_config.storage if self.batch_config else None
+        for path in files:
+            head, tail = StorageTarget.split_url(path)
+            file_storage = storage or StorageTarget.from_url(head)
+            with file_storage.open(tail, mode="rb") as file:
+                for batch, sources in columnar.read_record_batches(
+                    file,
+                    encoding.format,
+                    encoding.compression,
+                    fields,
+                    self.max_size,
+                    deserialize_json,
+                ):
+                    self.record_counter_metric.increment(len(sources))
+                    self._submit(
+                        functools.partial(self._write_record_batch, batch, sources, truncate_to_day)
+                    )
+
+    def _columnar_batch_files_supported(self, encoding: BaseBatchFileEncoding) -> bool:
+        """Return whether BATCH files with this encoding can take the columnar path.
+
+        Args:
+            encoding: The batch file encoding.
+
+        Returns:
+            True if enabled, pyarrow is installed and all field paths are plain column names.
+        """
+        if not self.config.get("columnar_batch_files"):
+            return False
+        if encoding.format not in ("jsonl", "parquet"):
+            return False
+        try:
+            from target_elasticsearch import columnar
+        except ImportError:
+            self.logger.warning(
+                "columnar_batch_files requires pyarrow, processing records one by one"
+            )
+            return False
+        paths = [*(self.metadata_fields or {}).values(), *(self.index_schema_fields or {}).values()]
+        if not all(columnar.simple_field(path) for path in paths):
+            self.logger.info(
+                f"metadata_fields or index_schema_fields of {self.stream_name} use JSONPath "
+                "expressions beyond a top-level field, processing records one by one"
+            )
+            return False
+        return True
+
+    def _write_record_batch(
+        self, batch: Optional[Any], sources: list[dict], truncate_to_day: Set[str]
+    ) -> None:
+        """Build and write the bulk actions of an Arrow record batch.
+
+        Args:
+            batch: pyarrow record batch read from a BATCH file, None if its columns
+                could not be built.
+            sources: Records of the batch, as the SDK would parse them.
+            truncate_to_day: Index template variables only used through date helpers.
+        """
+        from target_elasticsearch import columnar
+
+        schema_fields = self.index_schema_fields or {}
+        if batch is None or not columnar.supports_index_columns(
+            batch.schema, schema_fields, truncate_to_day
+        ):
+            self._write_records(sources)
+            return
+        if schema_fields:
+            indices, distinct_indices = columnar.index_column(
+                batch, schema_fields, truncate_to_day, self._template_index, sources
+            )
+        else:
+            indices, distinct_indices = [self.index_name] * len(sources), set()
+        metadata = columnar.metadata_columns(batch, self.metadata_fields or {}, sources)
+        if self.projection is not None:
+            sources = [self.projection(source) for source in sources]
+        actions = []
+        for row, (index, source) in enumerate(zip(indices, sources)):
+            action = {"_op_type": "index", "_index": index, "_source": source}
+            for key, values in metadata.items():
+                action[key] = values[row]
+            actions.append(action)
+        self._write_actions(actions, distinct_indices)
 
     def _template_index(self, schemas: dict = {}) -> str:
         """Template the input index config for Elasticsearch indexing.
@@ -76,15 +366,18 @@ class ElasticSink(BatchSink):
                 "current_timestamp_daily": today.strftime(ELASTIC_DAILY_FORMAT),
                 "current_timestamp_monthly": today.strftime(ELASTIC_MONTHLY_FORMAT),
                 "current_timestamp_yearly": today.strftime(ELASTIC_YEARLY_FORMAT),
-                "to_daily": lambda date: parse(date).date().strftime(ELASTIC_DAILY_FORMAT),
-                "to_monthly": lambda date: parse(date).date().strftime(ELASTIC_MONTHLY_FORMAT),
-                "to_yearly": lambda date: parse(date).date().strftime(ELASTIC_YEARLY_FORMAT),
+                "to_daily": _date_formatter(ELASTIC_DAILY_FORMAT),
+                "to_monthly": _date_formatter(ELASTIC_MONTHLY_FORMAT),
+                "to_yearly": _date_formatter(ELASTIC_YEARLY_FORMAT),
             },
             **schemas,
         }
-        environment = jinja2.Environment()
-        template = environment.from_string(self.config["index_format"])
-        return re.sub(r"[^a-z0-9-]+", "", template.render(**arguments).replace("_", "-").lower())
+        if self._index_template is None:
+            import jinja2
+
+            self._index_template = jinja2.Environment().from_string(self.config["index_format"])
+        rendered = self._index_template.render(**arguments)
+        return re.sub(r"[^a-z0-9-]+", "", rendered.replace("_", "-").lower())
 
     def _build_fields(
         self,
@@ -104,7 +397,7 @@ class ElasticSink(BatchSink):
         """
         schemas = {}
         for k, v in mapping.items():
-            expression = compiled[k] if compiled and k in compiled else jsonpath_ng.parse(v)
+            expression = compiled[k] if compiled and k in compiled else _parse_jsonpath(v)
             match = expression.find(record)
             if len(match) == 0:
                 self.logger.warning(
@@ -146,7 +439,8 @@ class ElasticSink(BatchSink):
                 distinct_indices.add(index)
             else:
                 index = self.index_name
-            updated_record = {"_op_type": "index", "_index": index, "_source": record}
+            source = record if self.projection is None else self.projection(record)
+            updated_record = {"_op_type": "index", "_index": index, "_source": source}
             if self.metadata_fields is not None:
                 # Build metadata fields for the record
                 metadata_fields = self._build_fields(
@@ -229,23 +523,370 @@ class ElasticSink(BatchSink):
     def process_batch(self, context: dict[str, Any]) -> None:
         """Handle batch records and override the default sink implementation.
 
+        When `concurrent_sinks` is enabled the records are handed to this sink's
+        drain worker instead, so other streams keep flowing while this one is sent.
+        The index is prepared here too, since BATCH messages reach this method
+        without going through `process_record`.
+
         Args:
             context: Dictionary containing batch processing context including records.
         """
-        updated_records, distinct_indices = self.build_request_body_and_distinct_indices(
-            context["records"]
-        )
+        if not self._index_ready:
+            self._prepare_index()
+        self._submit(functools.partial(self._write_records, context["records"]))
+
+    def _submit(self, task: Callable[[], None]) -> None:
+        """Run a write, or hand it to the drain worker when `concurrent_sinks` is enabled.
+
+        Args:
+            task: Writes a batch to Elasticsearch.
+        """
+        if self._drain_queue is None:
+            task()
+            return
+        self._raise_drain_error()
+        self._drain_queue.put(task)
+
+    def _write_records(self, records: list[dict[str, Union[str, dict[str, str], int]]]) -> None:
+        """Build the bulk request for a batch of records and send it to Elasticsearch.
+
+        Args:
+            records: List of records to write.
+        """
+        updated_records, distinct_indices = self.build_request_body_and_distinct_indices(records)
+        self._write_actions(updated_records, distinct_indices)
+
+    def _write_actions(self, actions: list[dict[str, Any]], distinct_indices: Set[str]) -> None:
+        """Send bulk actions to Elasticsearch, or to the spool when one is configured.
+
+        Args:
+            actions: Bulk actions as built by `build_request_body_and_distinct_indices`.
+            distinct_indices: Indices targeted by the actions, created before sending.
+        """
+        new_hashes = None
+        if self._content_hashes is not None:
+            actions, new_hashes = self._skip_unchanged(actions)
+        if self._spool is not None:
+            if self.index_name:
+                distinct_indices.add(self.index_name)
+            if actions:
+                self._spool.append(self._spool_payload(actions, distinct_indices, new_hashes))
+            return
         for index in distinct_indices:
             self.create_index(index)
+        if not actions:
+            return
+        if self._inflight_budget:
+            # Serialized once so the reserved size is exactly what goes on the wire.
+            body = self._bulk_body(actions)
+            self._inflight_budget.acquire(len(body))
+            try:
+                failures = self._send_bulk_body(body)
+            finally:
+                self._inflight_budget.release(len(body))
+            self._store_hashes(new_hashes, self._failed_documents(failures))
+            return
         try:
-            bulk(self.client, updated_records)
+            bulk(self.client, actions)
         except elasticsearch.helpers.BulkIndexError as e:
             self.logger.error(e.errors)
+        else:
+            self._store_hashes(new_hashes)
+
+    def _skip_unchanged(
+        self, actions: list[dict[str, Any]]
+    ) -> Tuple[list[dict[str, Any]], dict[str, dict[str, bytes]]]:
+        """Drop actions whose `_source` is unchanged since it was last indexed.
+
+        Only actions with an `_id` can be matched; the others are always kept.
+
+        Args:
+            actions: Bulk actions as built by `build_request_body_and_distinct_indices`.
+
+        Returns:
+            Tuple containing the actions to send and, per index, the hashes to store
+            once they have been indexed.
+        """
+        hashes: dict[str, dict[str, bytes]] = {}
+        for action in actions:
+            if action.get("_id") is not None:
+                hashes.setdefault(action["_index"], {})[str(action["_id"])] = content_hash(
+                    action["_source"]
+                )
+        changed = {
+            index: self._content_hashes.changed(index, index_hashes)
+            for index, index_hashes in hashes.items()
+        }
+        kept = [
+            action
+            for action in actions
+            if action.get("_id") is None or str(action["_id"]) in changed[action["_index"]]
+        ]
+        if len(kept) < len(actions):
+            self.logger.debug(
+                f"Skipping {len(actions) - len(kept)} unchanged documents for {self.stream_name}"
+            )
+        return kept, changed
+
+    def _store_hashes(
+        self,
+        hashes: Optional[dict[str, dict[str, bytes]]],
+        failed: Set[Tuple[str, str]] = frozenset(),
+    ) -> None:
+        """Record the content hashes of documents that were written.
+
+        Hashes are only stored once the batch was accepted, leaving out the documents
+        Elasticsearch rejected, so those are sent again on the next run.
+
+        Args:
+            hashes: Hashes per index as returned by `_skip_unchanged`.
+            failed: `(_index, _id)` pairs of the documents that failed to index.
+        """
+        for index, index_hashes in (hashes or {}).items():
+            index_hashes = {
+                document_id: digest
+                for document_id, digest in index_hashes.items()
+                if (index, document_id) not in failed
+            }
+            if index_hashes:
+                self._content_hashes.update(index, index_hashes)
+
+    @staticmethod
+    def _spool_payload(
+        actions: list[dict[str, Any]],
+        indices: Set[str],
+        hashes: Optional[dict[str, dict[str, bytes]]] = None,
+    ) -> bytes:
+        """Serialize bulk actions into a spool payload.
+
+        The first line lists the indices the actions target and the content hashes to
+        store once they are indexed, the rest is the NDJSON bulk body.
+
+        Args:
+            actions: Bulk actions as built by `build_request_body_and_distinct_indices`.
+            indices: Indices that must exist before the body is sent.
+            hashes: Hashes per index as returned by `_skip_unchanged`, if any.
+
+        Returns:
+            Payload bytes to append to the spool.
+        """
+        header = {"indices": sorted(indices)}
+        if hashes:
+            header["hashes"] = {
+                index: {document_id: digest.hex() for document_id, digest in index_hashes.items()}
+                for index, index_hashes in hashes.items()
+            }
+        header = json.dumps(header).encode()
+        return header + b"\n" + ElasticSink._bulk_body(actions)
+
+    @staticmethod
+    def _bulk_body(actions: list[dict[str, Any]]) -> bytes:
+        """Serialize bulk actions into an NDJSON bulk request body.
+
+        Args:
+            actions: Bulk actions as built by `build_request_body_and_distinct_indices`.
+
+        Returns:
+            Body bytes for `Elasticsearch.bulk`.
+        """
+        lines = []
+        for action, data in map(expand_action, actions):
+            lines.append(_SERIALIZER.dumps(action))
+            if data is not None:
+                lines.append(_SERIALIZER.dumps(data))
+        return b"\n".join(lines) + b"\n"
+
+    def _send_bulk_body(self, body: bytes) -> list[Tuple[int, dict[str, Any]]]:
+        """Send a serialized bulk body and log the documents that failed to index.
+
+        Args:
+            body: Body as built by `_bulk_body`.
+
+        Returns:
+            Position in the body and bulk result of each document that failed to index.
+        """
+        response = self.client.bulk(operations=body)
+        if not response["errors"]:
+            return []
+        results = (next(iter(item.values())) for item in response["items"])
+        failures = [
+            (position, result) for position, result in enumerate(results) if "error" in result
+        ]
+        self.logger.error([result for _, result in failures])
+        return failures
+
+    @staticmethod
+    def _failed_documents(failures: list[Tuple[int, dict[str, Any]]]) -> Set[Tuple[str, str]]:
+        """Return the `(_index, _id)` pairs of failed bulk results.
+
+        Args:
+            failures: Failures as returned by `_send_bulk_body`.
+
+        Returns:
+            Documents whose content hash must not be stored.
+        """
+        return {(result.get("_index"), str(result.get("_id"))) for _, result in failures}
+
+    @staticmethod
+    def _retryable_status(status: int) -> bool:
+        """Return whether an HTTP status means the request may succeed when sent again.
+
+        Args:
+            status: HTTP status of a request or of a document in a bulk response.
+
+        Returns:
+            True for throttling (429) and server errors (5xx).
+        """
+        return status == 429 or status >= 500
+
+    @staticmethod
+    def _bulk_body_subset(body: bytes, positions: list[int]) -> bytes:
+        """Extract the operations at the given positions from a bulk body.
+
+        Args:
+            body: Body as built by `_bulk_body`.
+            positions: Positions of the operations to keep, as reported in the response.
+
+        Returns:
+            Bulk body holding only those operations.
+        """
+        lines = body.split(b"\n")
+        operations = []
+        line = 0
+        while line < len(lines) and lines[line]:
+            # Every operation but `delete` is followed by a source line.
+            size = 1 if "delete" in json.loads(lines[line]) else 2
+            end = line + size
+            operations.append(lines[line:end])
+            line = end
+        return b"".join(b"\n".join(operations[position]) + b"\n" for position in positions)
+
+    def _send_spooled(self, payload: bytes) -> Optional[bytes]:
+        """Send a spooled bulk body to Elasticsearch, called by the spool drainer.
+
+        Errors propagate so the spool retries the payload or, when
+        `_retryable_spool_error` rejects them, sets it aside. Documents that fail
+        with a retryable status (429, 5xx) are handed back to the spool to be sent
+        again; other per-document failures are logged like in the direct bulk path.
+        Content hashes are stored once the response arrives, except for the
+        documents that failed.
+
+        Args:
+            payload: Payload as built by `_spool_payload`.
+
+        Returns:
+            None once every document was indexed or rejected, otherwise a payload
+            holding the documents to retry.
+        """
+        raw_header, _, body = bytes(payload).partition(b"\n")
+        header = json.loads(raw_header)
+        for index in header["indices"]:
+            if index not in self._spooled_indices:
+                self.create_index(index)
+                self._spooled_indices.add(index)
+        if self._inflight_budget:
+            self._inflight_budget.acquire(len(body))
+        try:
+            failures = self._send_bulk_body(body)
+        finally:
+            if self._inflight_budget:
+                self._inflight_budget.release(len(body))
+        if self._content_hashes is not None and header.get("hashes"):
+            hashes = {
+                index: {document_id: bytes.fromhex(digest) for document_id, digest in items.items()}
+                for index, items in header["hashes"].items()
+            }
+            self._store_hashes(hashes, self._failed_documents(failures))
+        retry = [
+            position
+            for position, result in failures
+            if self._retryable_status(result.get("status", 0))
+        ]
+        if not retry:
+            return None
+        return raw_header + b"\n" + self._bulk_body_subset(body, retry)
+
+    @classmethod
+    def _retryable_spool_error(cls, error: Exception) -> bool:
+        """Return whether a spooled bulk body that failed with `error` should be sent again.
+
+        Args:
+            error: Exception raised by `_send_spooled`.
+
+        Returns:
+            True for transport errors, throttling (429) and server errors (5xx).
+        """
+        if isinstance(error, elasticsearch.ApiError):
+            return cls._retryable_status(error.status_code)
+        return isinstance(error, elasticsearch.TransportError)
+
+    def _start_drain_worker(self) -> None:
+        """Start the background thread that drains this sink's queued batches."""
+        self._drain_queue = queue.Queue(maxsize=self.config.get("sink_queue_size") or 1)
+        self._drain_worker = threading.Thread(
+            target=self._drain_worker_loop,
+            name=f"elasticsearch-sink-{self.stream_name}",
+            daemon=True,
+        )
+        self._drain_worker.start()
+
+    def _drain_worker_loop(self) -> None:
+        """Write queued batches until the stop sentinel is received.
+
+        Once a batch fails, the remaining queued batches are discarded; the error is
+        re-raised on the main thread by `process_batch` or `wait_for_drain`.
+        """
+        while True:
+            task = self._drain_queue.get()
+            try:
+                if task is _STOP_WORKER:
+                    return
+                if self._drain_error is None:
+                    task()
+            except BaseException as e:
+                self._drain_error = e
+            finally:
+                self._drain_queue.task_done()
+
+    def _raise_drain_error(self) -> None:
+        """Re-raise a failure from the drain worker on the calling thread."""
+        if self._drain_error is not None:
+            raise self._drain_error
+
+    def wait_for_drain(self) -> None:
+        """Block until every queued batch has been written to Elasticsearch."""
+        if self._drain_queue is not None:
+            self._drain_queue.join()
+        self._raise_drain_error()
 
     def clean_up(self) -> None:
-        """Close the Elasticsearch client connection."""
+        """Flush queued and spooled batches and close the Elasticsearch client connection."""
         self.logger.debug(f"Cleaning up sink for {self.stream_name}")
-        self.client.close()
+        try:
+            self.wait_for_drain()
+        finally:
+            if self._drain_worker is not None:
+                self._drain_queue.put(_STOP_WORKER)
+                self._drain_worker.join()
+                self._drain_worker = None
+                self._drain_queue = None
+            if self._spool is not None:
+                self._close_spool()
+            if self._content_hashes is not None:
+                self._content_hashes.close()
+                self._content_hashes = None
+            if self._client is not None:
+                self._client.close()
+
+    def _close_spool(self) -> None:
+        """Wait for the spool to drain, keeping unsent data on disk for the next run."""
+        if not self._spool.flush(self._flush_deadline.remaining()):
+            self.logger.warning(
+                f"{self._spool.pending_bytes} spooled bytes for {self.stream_name} were not "
+                f"acknowledged, they are kept in {self._spool.directory} for the next run"
+            )
+        self._spool.close()
+        self._spool = None
 
     def _elasticsearch_user_agent(self) -> str:
         """Return a user agent string for the Elasticsearch client.
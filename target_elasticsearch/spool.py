@@ -0,0 +1,400 @@
+"""Write-ahead disk spool decoupling record ingestion from Elasticsearch latency.
+
+Payloads are appended as framed entries to append-only segment files. A
+background drainer memory-maps the segments, replays every frame through a
+send callback and records the acknowledged offset next to the segment, so a
+restarted spool resumes where the previous one stopped. Fully acknowledged,
+sealed segments are deleted.
+
+Frame layout: 4-byte little-endian payload length, 4-byte CRC32 of the payload,
+then the payload. A torn frame at the tail of a segment (e.g. after a crash) is
+truncated away on recovery.
+
+Every spool instance writes to its own subdirectory, held under an exclusive
+`flock` for as long as the spool is open. Several instances can therefore share
+a directory (e.g. the sinks before and after a schema change); segments of an
+instance are only recovered by another one once it is closed or has crashed.
+"""
+
+import fcntl
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import uuid
+import zlib
+
+from typing import Callable, Optional
+
+FRAME_HEADER = struct.Struct("<II")
+ACK = struct.Struct("<Q")
+SEGMENT_SUFFIX = ".seg"
+ACK_SUFFIX = ".ack"
+LOCK_NAME = "LOCK"
+REJECTED_DIRECTORY = "rejected"
+# Instance subdirectories sort in creation order: `<time_ns>-<pid>-<random>`.
+INSTANCE_NAME = re.compile(r"\d{20}-\d+-[0-9a-f]{8}")
+SEGMENT_BYTES_DEFAULT = 64 * 1024 * 1024
+
+RETRY_BACKOFF_INITIAL = 1.0
+RETRY_BACKOFF_MAX = 30.0
+
+
+class _Segment:
+    """Bookkeeping for a single segment file."""
+
+    def __init__(self, directory: str, seq: int):
+        self.seq = seq
+        self.path = os.path.join(directory, f"{seq:020d}{SEGMENT_SUFFIX}")
+        self.ack_path = os.path.join(directory, f"{seq:020d}{ACK_SUFFIX}")
+        self.size = 0
+        self.acked = 0
+        self.sealed = False
+
+    def read_ack(self) -> int:
+        try:
+            with open(self.ack_path, "rb") as f:
+                data = f.read(ACK.size)
+        except FileNotFoundError:
+            return 0
+        return ACK.unpack(data)[0] if len(data) == ACK.size else 0
+
+    def write_ack(self, offset: int) -> None:
+        # Overwrite in place so a crash never leaves an empty ack file behind.
+        fd = os.open(self.ack_path, os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            os.pwrite(fd, ACK.pack(offset), 0)
+        finally:
+            os.close(fd)
+        self.acked = offset
+
+    def remove(self) -> None:
+        for path in (self.path, self.ack_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _valid_length(path: str) -> int:
+    """Return the length of the longest prefix of complete, checksummed frames.
+
+    Args:
+        path: Segment file to scan.
+
+    Returns:
+        Offset just past the last valid frame.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return 0
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        offset = 0
+        while offset + FRAME_HEADER.size <= size:
+            length, checksum = FRAME_HEADER.unpack_from(data, offset)
+            start = offset + FRAME_HEADER.size
+            end = start + length
+            if end > size or zlib.crc32(data[start:end]) != checksum:
+                break
+            offset = end
+    return offset
+
+
+def _try_lock(path: str) -> Optional[int]:
+    """Take an exclusive, non-blocking `flock` on an existing lock file.
+
+    Args:
+        path: Lock file of a spool instance.
+
+    Returns:
+        Open file descriptor holding the lock, or None if another spool holds it
+        or the instance directory is gone.
+    """
+    try:
+        fd = os.open(path, os.O_RDWR)
+    except FileNotFoundError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _remove_instance(directory: str, lock_fd: int) -> None:
+    """Delete an instance directory without segments, then release its lock."""
+    try:
+        os.remove(os.path.join(directory, LOCK_NAME))
+        os.rmdir(directory)
+    except OSError:
+        pass
+    os.close(lock_fd)
+
+
+class DiskSpool:
+    """Append-only, segment based spool replayed to a send callback in the background.
+
+    Delivery is at-least-once: a frame whose acknowledgement was lost in a crash
+    is sent again when the spool is reopened. The send callback returns None once
+    a payload is delivered, or the part of it that must be retried. A frame whose
+    send fails with an error `retryable` rejects is not retried: it is copied to
+    the `rejected` subdirectory and acknowledged so the frames after it keep flowing.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        send: Callable[[bytes], Optional[bytes]],
+        segment_bytes: int = SEGMENT_BYTES_DEFAULT,
+        logger: Optional[logging.Logger] = None,
+        retryable: Optional[Callable[[Exception], bool]] = None,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.logger = logger or logging.getLogger(__name__)
+        self._send = send
+        self._retryable = retryable or (lambda error: True)
+        self._segments: list[_Segment] = []
+        self._active: Optional[_Segment] = None
+        self._active_file = None
+        self._condition = threading.Condition()
+        self._closed = False
+        self._drainer: Optional[threading.Thread] = None
+        self._adopted: list[tuple[str, int]] = []
+        self._next_seq = 0
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+        self.instance_directory, self._lock_fd = self._create_instance()
+
+    def _create_instance(self) -> tuple[str, int]:
+        """Create and lock this spool's own subdirectory.
+
+        The directory is locked under a temporary name and renamed afterwards, so
+        another spool never sees it unlocked.
+
+        Returns:
+            Tuple containing the instance directory and the descriptor holding its lock.
+        """
+        name = f"{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        staging = os.path.join(self.directory, f".{name}")
+        os.mkdir(staging)
+        fd = os.open(os.path.join(staging, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        instance = os.path.join(self.directory, name)
+        os.rename(staging, instance)
+        return instance, fd
+
+    def _recover(self) -> None:
+        """Adopt the segments of closed or crashed instances and drop torn tails.
+
+        Instances are visited in creation order; those still locked by a live spool
+        are left alone. Adopted instances stay locked until this spool is closed.
+        """
+        for name in sorted(os.listdir(self.directory)):
+            if not INSTANCE_NAME.fullmatch(name):
+                continue
+            instance = os.path.join(self.directory, name)
+            lock_fd = _try_lock(os.path.join(instance, LOCK_NAME))
+            if lock_fd is None:
+                continue
+            segments = self._recover_instance(instance)
+            if segments:
+                self._segments.extend(segments)
+                self._adopted.append((instance, lock_fd))
+            else:
+                _remove_instance(instance, lock_fd)
+        if self._segments:
+            self.logger.info(
+                f"Recovered {len(self._segments)} unacknowledged spool segment(s) "
+                f"in {self.directory}"
+            )
+
+    def _recover_instance(self, directory: str) -> list[_Segment]:
+        """Load the unacknowledged segments of a locked instance directory."""
+        seqs = sorted(
+            int(name[: -len(SEGMENT_SUFFIX)])
+            for name in os.listdir(directory)
+            if re.fullmatch(r"\d+" + re.escape(SEGMENT_SUFFIX), name)
+        )
+        segments = []
+        for seq in seqs:
+            segment = _Segment(directory, seq)
+            valid = _valid_length(segment.path)
+            if valid != os.path.getsize(segment.path):
+                self.logger.warning(
+                    f"Truncating torn frame at offset {valid} of spool segment {segment.path}"
+                )
+                os.truncate(segment.path, valid)
+            segment.size = valid
+            segment.acked = min(segment.read_ack(), valid)
+            segment.sealed = True
+            if segment.acked >= segment.size:
+                segment.remove()
+            else:
+                segments.append(segment)
+        return segments
+
+    @property
+    def pending_bytes(self) -> int:
+        """Bytes written to the spool that have not been acknowledged yet."""
+        with self._condition:
+            return sum(segment.size - segment.acked for segment in self._segments)
+
+    def append(self, payload: bytes) -> None:
+        """Durably append a payload to the spool.
+
+        Args:
+            payload: Opaque bytes replayed later through the send callback.
+        """
+        frame = FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._condition:
+            if self._closed:
+                raise RuntimeError(f"spool {self.directory} is closed")
+            if self._active is None:
+                self._active = _Segment(self.instance_directory, self._next_seq)
+                self._next_seq += 1
+                self._active_file = open(self._active.path, "ab")
+                self._segments.append(self._active)
+            self._active_file.write(frame)
+            self._active_file.flush()
+            os.fsync(self._active_file.fileno())
+            self._active.size += len(frame)
+            if self._active.size >= self.segment_bytes:
+                self._seal_active()
+            self._condition.notify_all()
+
+    def _seal_active(self) -> None:
+        """Close the active segment so the next append starts a new one."""
+        self._active_file.close()
+        self._active.sealed = True
+        self._active = None
+        self._active_file = None
+
+    def start(self) -> None:
+        """Start the background drainer."""
+        self._drainer = threading.Thread(
+            target=self._drain, name=f"elasticsearch-spool-{self.directory}", daemon=True
+        )
+        self._drainer.start()
+
+    def _next_segment(self) -> Optional[_Segment]:
+        """Wait for a segment with unacknowledged frames; None once closed."""
+        with self._condition:
+            while True:
+                for segment in list(self._segments):
+                    if segment.acked < segment.size:
+                        return segment
+                    if segment.sealed:
+                        segment.remove()
+                        self._segments.remove(segment)
+                        self._condition.notify_all()
+                if self._closed:
+                    return None
+                self._condition.wait()
+
+    def _drain(self) -> None:
+        """Replay frames in order, acknowledging each once it is delivered or rejected."""
+        while True:
+            segment = self._next_segment()
+            if segment is None:
+                return
+            with open(segment.path, "rb") as f, mmap.mmap(
+                f.fileno(), segment.size, access=mmap.ACCESS_READ
+            ) as data:
+                offset = segment.acked
+                while offset < len(data):
+                    length, _ = FRAME_HEADER.unpack_from(data, offset)
+                    start = offset + FRAME_HEADER.size
+                    end = start + length
+                    if not self._deliver(segment, offset, data[start:end]):
+                        return
+                    with self._condition:
+                        segment.write_ack(end)
+                        self._condition.notify_all()
+                    offset = end
+
+    def _deliver(self, segment: _Segment, offset: int, payload: bytes) -> bool:
+        """Send a frame, retrying with backoff until it is accepted or rejected.
+
+        The send callback may return a smaller payload holding the part of the frame
+        that must be retried; only that part is sent again.
+
+        Returns:
+            False if the spool was closed while backing off.
+        """
+        backoff = RETRY_BACKOFF_INITIAL
+        while True:
+            try:
+                remaining = self._send(payload)
+            except Exception as e:
+                if not self._retryable(e):
+                    self._reject(segment, offset, payload, e)
+                    return True
+                self.logger.warning(f"Spool replay failed, retrying in {backoff:.0f}s: {e}")
+            else:
+                if remaining is None:
+                    return True
+                self.logger.warning(
+                    f"Spool replay partially failed, retrying the rest in {backoff:.0f}s"
+                )
+                payload = remaining
+            with self._condition:
+                if self._condition.wait_for(lambda: self._closed, timeout=backoff):
+                    return False
+            backoff = min(backoff * 2, RETRY_BACKOFF_MAX)
+
+    def _reject(self, segment: _Segment, offset: int, payload: bytes, error: Exception) -> None:
+        """Set aside a frame that failed with a non-retryable error."""
+        rejected = os.path.join(self.directory, REJECTED_DIRECTORY)
+        os.makedirs(rejected, exist_ok=True)
+        instance = os.path.basename(os.path.dirname(segment.path))
+        path = os.path.join(rejected, f"{instance}-{segment.seq:020d}-{offset:020d}.frame")
+        with open(path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        self.logger.error(
+            f"Spool replay failed with a non-retryable error, moved to {path}: {error}"
+        )
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every appended payload has been acknowledged.
+
+        Args:
+            timeout: Seconds to wait at most, forever when None.
+
+        Returns:
+            True if the spool is fully drained, False if the timeout expired.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: all(segment.acked >= segment.size for segment in self._segments),
+                timeout=timeout,
+            )
+
+    def close(self) -> None:
+        """Stop the drainer and close the active segment, keeping unacknowledged data on disk."""
+        with self._condition:
+            self._closed = True
+            if self._active is not None:
+                self._seal_active()
+            self._condition.notify_all()
+        if self._drainer is not None:
+            self._drainer.join()
+            self._drainer = None
+        with self._condition:
+            for segment in [s for s in self._segments if s.acked >= s.size]:
+                segment.remove()
+                self._segments.remove(segment)
+            # Release every instance; those with segments left are adopted by the next spool.
+            directories = {os.path.dirname(segment.path) for segment in self._segments}
+            for instance, lock_fd in [*self._adopted, (self.instance_directory, self._lock_fd)]:
+                if instance in directories:
+                    os.close(lock_fd)
+                else:
+                    _remove_instance(instance, lock_fd)
+            self._adopted = []
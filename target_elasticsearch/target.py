@@ -1,6 +1,7 @@
 from pathlib import PurePath
 from typing import Dict
 from singer_sdk import typing as th
+from singer_sdk.sinks import Sink
 from singer_sdk.target_base import Target
 from target_elasticsearch import sinks
 
@@ -131,6 +132,33 @@ class TargetElasticsearch(Target):
     See: https://www.elastic.co/guide/en/elasticsearch/reference/current/mapping.html""",
             default=None,
         ),
+        th.Property(
+            "field_projections",
+            th.ObjectType(),
+            description="""Field Projections select what is sent as `_source` for each stream, applied while
+    the bulk request is built. `metadata_fields` and `index_schema_fields` still read the full record.
+    Format: {"stream_name": {"include": [...], "exclude": [...], "rename": {"old": "new"},
+    "flatten": true, "flatten_separator": ".", "drop_nulls": true}}
+    Example: {"users": {"include": ["id", "email", "address"], "flatten": true, "drop_nulls": true}}""",
+            default=None,
+        ),
+        th.Property(
+            "content_hash_db",
+            th.StringType,
+            description="""Path to a SQLite file storing a hash of each indexed document's `_source`, keyed
+    on `_index` and `_id`. When set, documents identical to what was last indexed are left out of
+    the bulk request, turning full-table reloads into diffs. Requires `_id` in `metadata_fields`;
+    documents without an `_id` are always sent.""",
+            default=None,
+        ),
+        th.Property(
+            "columnar_batch_files",
+            th.BooleanType,
+            description="""Read JSONL and Parquet files of BATCH messages column-wise with pyarrow
+    (`pip install target-elasticsearch[arrow]`), computing index names and metadata fields per column.
+    Applies when `metadata_fields` and `index_schema_fields` only select top-level fields.""",
+            default=False,
+        ),
         th.Property(
             "request_timeout",
             th.NumberType,
@@ -143,6 +171,48 @@ class TargetElasticsearch(Target):
             description="retry failed requests on timeout",
             default=True,
         ),
+        th.Property(
+            "concurrent_sinks",
+            th.BooleanType,
+            description="""Give each stream its own drain queue and worker thread so a slow stream
+    does not block building and sending batches for the other streams.""",
+            default=False,
+        ),
+        th.Property(
+            "sink_queue_size",
+            th.IntegerType,
+            description="number of batches each stream may queue when `concurrent_sinks` is enabled",
+            default=2,
+        ),
+        th.Property(
+            "max_inflight_bulk_bytes",
+            th.IntegerType,
+            description="""cap on the bulk request bytes being sent at once across all streams,
+    whether sinks are drained by their own workers or by the SDK's parallel drain,
+    unlimited when unset""",
+            default=None,
+        ),
+        th.Property(
+            "spool_dir",
+            th.StringType,
+            description="""Directory for a write-ahead spool. When set, bulk bodies are appended to
+    segment files under `<spool_dir>/<stream_name>` and replayed to Elasticsearch by a background
+    drainer, so reading input no longer waits on the cluster. Unsent data is replayed on the next run.""",
+            default=None,
+        ),
+        th.Property(
+            "spool_segment_bytes",
+            th.IntegerType,
+            description="size in bytes after which a spool segment is sealed and a new one started",
+            default=64 * 1024 * 1024,
+        ),
+        th.Property(
+            "spool_flush_timeout",
+            th.NumberType,
+            description="""seconds to wait, across all streams, for the spools to drain at the end
+    of a run, forever when unset""",
+            default=300,
+        ),
     ).to_dict()
     default_sink_class = sinks.ElasticSink
 
@@ -166,6 +236,23 @@ class TargetElasticsearch(Target):
         assert bool(self.config.get("api_key_id") is None) == bool(
             self.config.get("api_key") is None
         )
+        self.inflight_budget = (
+            sinks.InflightBytesBudget(self.config["max_inflight_bulk_bytes"])
+            if self.config.get("max_inflight_bulk_bytes")
+            else None
+        )
+        self.spool_flush_deadline = sinks.FlushDeadline(self.config.get("spool_flush_timeout"))
+
+    def _drain_all(self, sink_list: list[Sink], parallelism: int) -> None:
+        """Drain all sinks and wait for their workers before state is emitted.
+
+        Args:
+            sink_list: Sinks to drain.
+            parallelism: Number of sinks drained at once by the SDK.
+        """
+        super()._drain_all(sink_list, parallelism)
+        for sink in sink_list:
+            sink.wait_for_drain()
 
     @property
     def state(self) -> Dict:
@@ -0,0 +1,271 @@
+"""Tests for column-wise preparation of BATCH message files."""
+
+import gzip
+import io
+import json
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from singer_sdk.helpers._batch import JSONLinesEncoding
+from singer_sdk.singerlib.json import deserialize_json
+
+from target_elasticsearch.sinks import ElasticSink
+
+pa = pytest.importorskip("pyarrow")
+
+from target_elasticsearch import columnar  # noqa: E402
+
+
+def _render(fields):
+    """Stand-in for ElasticSink._template_index recording each rendering."""
+    _render.calls.append(fields)
+    return "ecs-" + "-".join(str(value) for value in fields.values())
+
+
+class TestFieldPaths:
+    """Detect which JSONPath expressions and template variables allow the columnar path."""
+
+    @pytest.mark.parametrize("path,field", [("id", "id"), ("$.id", "id"), ("ts_1", "ts_1")])
+    def test_simple_field(self, path, field):
+        assert columnar.simple_field(path) == field
+
+    @pytest.mark.parametrize("path", ["a.b", "$.a.b", "items[0]", "$..id", "@timestamp"])
+    def test_complex_path(self, path):
+        assert columnar.simple_field(path) is None
+
+    def test_date_helper_only_fields(self):
+        """Only variables never used outside a date helper can be truncated."""
+        index_format = "ecs-{{ to_daily(ts) }}-{{ region }}-{{ to_yearly(other) }}-{{ other }}"
+        assert columnar.date_helper_only_fields(index_format, ["ts", "region", "other"]) == {"ts"}
+
+
+class TestIndexColumn:
+    """Compute each row's index with one template rendering per distinct value."""
+
+    def setup_method(self):
+        _render.calls = []
+
+    def test_timestamps_truncated_to_day(self):
+        """Helper-only ISO timestamps are reduced to their date before rendering."""
+        batch = pa.RecordBatch.from_pydict(
+            {
+                "created_at": [
+                    "2024-01-02T10:00:00Z",
+                    "2024-01-02T23:59:59-05:00",
+                    "2024-01-03T00:00:00Z",
+                ]
+            }
+        )
+        indices, distinct = columnar.index_column(batch, {"ts": "created_at"}, {"ts"}, _render)
+
+        assert indices == ["ecs-2024-01-02", "ecs-2024-01-02", "ecs-2024-01-03"]
+        assert distinct == {"ecs-2024-01-02", "ecs-2024-01-03"}
+        assert len(_render.calls) == 2
+
+    def test_multiple_fields_and_missing_column(self):
+        """Several fields are combined, and a missing column renders as its literal path."""
+        batch = pa.RecordBatch.from_pydict({"region": ["eu", "us", "eu"], "n": [1, 2, 1]})
+        fields = {"region": "region", "n": "$.n", "foo": "animals"}
+        indices, _ = columnar.index_column(batch, fields, set(), _render)
+
+        assert indices == ["ecs-eu-1-animals", "ecs-us-2-animals", "ecs-eu-1-animals"]
+        assert len(_render.calls) == 2
+
+    def test_missing_key_differs_from_null(self):
+        """A key absent from the record renders as its path, an explicit null as None."""
+        batch = pa.RecordBatch.from_pydict({"region": ["eu", None, None]})
+        sources = [{"region": "eu"}, {"region": None}, {}]
+        indices, _ = columnar.index_column(batch, {"r": "region"}, set(), _render, sources)
+
+        assert indices == ["ecs-eu", "ecs-None", "ecs-region"]
+
+    def test_nested_column_not_supported(self):
+        """Nested objects render differently per record and are left to the record path."""
+        schema = pa.schema([pa.field("geo", pa.struct([("region", pa.string())]))])
+        assert not columnar.supports_index_columns(schema, {"g": "geo"}, set())
+        assert columnar.supports_index_columns(schema, {"g": "missing"}, set())
+
+
+class TestMetadataColumns:
+    """Pick metadata fields straight from their columns."""
+
+    def test_metadata_columns(self):
+        batch = pa.RecordBatch.from_pydict({"id": ["a", "b"], "name": ["x", "y"]})
+        assert columnar.metadata_columns(batch, {"_id": "id", "_routing": "$.tenant"}) == {
+            "_id": ["a", "b"],
+            "_routing": ["$.tenant", "$.tenant"],
+        }
+
+    def test_missing_key_differs_from_null(self):
+        batch = pa.RecordBatch.from_pydict({"id": ["a", None, None]})
+        sources = [{"id": "a"}, {"id": None}, {}]
+        assert columnar.metadata_columns(batch, {"_id": "id"}, sources) == {
+            "_id": ["a", None, "id"]
+        }
+
+
+class TestReadRecordBatches:
+    """Read BATCH files into record batches."""
+
+    def test_gzipped_jsonl_keeps_date_strings(self):
+        """Date-time strings are kept as strings rather than inferred as timestamps."""
+        lines = [{"id": str(i), "created_at": "2024-01-02T10:00:00Z"} for i in range(5)]
+        data = gzip.compress("\n".join(json.dumps(line) for line in lines).encode())
+
+        batches = list(
+            columnar.read_record_batches(io.BytesIO(data), "jsonl", "gzip", ["created_at"], 2)
+        )
+
+        assert [batch.num_rows for batch, _ in batches] == [2, 2, 1]
+        assert all(
+            pa.types.is_string(batch.schema.field("created_at").type) for batch, _ in batches
+        )
+        assert [row for _, sources in batches for row in sources] == lines
+
+    def test_only_requested_columns_built(self):
+        """Records keep their own keys, and only the requested columns are built."""
+        lines = [{"id": "1", "a": 1}, {"id": "2", "b": None}]
+        data = "\n".join(json.dumps(line) for line in lines).encode()
+
+        batches = list(columnar.read_record_batches(io.BytesIO(data), "jsonl", None, ["id"], 10))
+
+        assert [sources for _, sources in batches] == [lines]
+        assert batches[0][0].schema.names == ["id"]
+
+    def test_mixed_type_columns(self):
+        """Mixed types are fine outside the requested columns and yield no batch inside them."""
+        data = b'{"id":1,"v":1}\n{"id":2,"v":"x"}\n'
+
+        ((batch, sources),) = columnar.read_record_batches(
+            io.BytesIO(data), "jsonl", None, ["id"], 10
+        )
+        assert batch.column("id").to_pylist() == [1, 2]
+        assert sources == [{"id": 1, "v": 1}, {"id": 2, "v": "x"}]
+
+        ((batch, _),) = columnar.read_record_batches(io.BytesIO(data), "jsonl", None, ["v"], 10)
+        assert batch is None
+
+    def test_field_missing_everywhere_is_templatable(self):
+        data = b'{"id":"1"}\n{"id":"2"}\n'
+        ((batch, _),) = columnar.read_record_batches(io.BytesIO(data), "jsonl", None, ["x"], 10)
+        assert pa.types.is_string(batch.schema.field("x").type)
+
+
+# ---------------------------------------------------------------------------
+# Test: sink
+# ---------------------------------------------------------------------------
+
+
+def _make_sink(concurrent_sinks=False):
+    """Create an ElasticSink taking the columnar path with a mocked target and client."""
+    config = {
+        "scheme": "http",
+        "host": "localhost",
+        "port": 9200,
+        "request_timeout": 10,
+        "retry_on_timeout": True,
+        "index_format": "ecs-{{ stream_name }}-{{ region }}",
+        "index_schema_fields": {"test_stream": {"region": "region"}},
+        "metadata_fields": {"test_stream": {"_id": "id", "_routing": "tenant"}},
+        "columnar_batch_files": True,
+        "concurrent_sinks": concurrent_sinks,
+    }
+
+    mock_target = MagicMock()
+    mock_target.config = config
+    mock_target.inflight_budget = None
+    mock_target._get_package_version.return_value = "0.0.0-test"
+
+    schema = {
+        "properties": {
+            "id": {"type": "string"},
+            "region": {"type": ["string", "null"]},
+            "tenant": {"type": ["string", "null"]},
+            "price": {"type": ["number", "null"]},
+            "geo": {"type": ["object", "null"]},
+        }
+    }
+
+    sink = ElasticSink(
+        target=mock_target,
+        stream_name="test_stream",
+        schema=schema,
+        key_properties=None,
+    )
+    sink._client = MagicMock()
+    return sink
+
+
+RECORDS = [
+    {"id": "1", "region": "eu", "tenant": "a", "price": 1.5, "geo": {"city": "Paris"}, "v": 1},
+    {"id": "2", "region": None, "extra": "only here", "v": [1]},
+    {"id": "3", "tenant": None, "price": 2, "v": "x"},
+]
+
+
+class TestColumnarSink:
+    """Verify BATCH files taking the columnar path index the same documents as records."""
+
+    def _batch_file(self, tmp_path):
+        lines = "\n".join(json.dumps(record) for record in RECORDS).encode()
+        path = tmp_path / "batch.jsonl.gz"
+        path.write_bytes(gzip.compress(lines))
+        return f"file://{path}"
+
+    def test_same_actions_as_record_path(self, tmp_path):
+        """Missing keys, explicit nulls, nested objects, numbers and mixed types match."""
+        sink = _make_sink()
+        url = self._batch_file(tmp_path)
+
+        with patch.object(ElasticSink, "create_index"), patch(
+            "target_elasticsearch.sinks.bulk"
+        ) as mock_bulk:
+            sink.process_batch_files(JSONLinesEncoding(compression="gzip"), [url])
+
+        actions = mock_bulk.call_args[0][1]
+        records = [deserialize_json(json.dumps(record)) for record in RECORDS]
+        expected, _ = sink.build_request_body_and_distinct_indices(records)
+        assert actions == expected
+        assert [action["_index"] for action in actions] == [
+            "ecs-test-stream-eu",
+            "ecs-test-stream-none",
+            "ecs-test-stream-region",
+        ]
+
+    def test_mixed_type_field_falls_back_to_records(self, tmp_path):
+        """Valid Singer input whose index field changes type is indexed like the record path."""
+        sink = _make_sink()
+        lines = b'{"id":"1","region":1}\n{"id":"2","region":"eu","v":{"x":1}}\n{"id":"3","v":"x"}\n'
+        path = tmp_path / "batch.jsonl"
+        path.write_bytes(lines)
+
+        with patch.object(ElasticSink, "create_index"), patch(
+            "target_elasticsearch.sinks.bulk"
+        ) as mock_bulk:
+            sink.process_batch_files(JSONLinesEncoding(), [f"file://{path}"])
+
+        records = [deserialize_json(line) for line in lines.splitlines()]
+        expected, _ = sink.build_request_body_and_distinct_indices(records)
+        assert mock_bulk.call_args[0][1] == expected
+
+    def test_batches_go_through_drain_queue(self, tmp_path):
+        """With `concurrent_sinks`, record batches are written by the drain worker and counted."""
+        sink = _make_sink(concurrent_sinks=True)
+        url = self._batch_file(tmp_path)
+        threads = []
+
+        def _bulk(client, actions):
+            threads.append(threading.current_thread())
+
+        with patch.object(ElasticSink, "create_index"), patch(
+            "target_elasticsearch.sinks.bulk", side_effect=_bulk
+        ), patch.object(sink.record_counter_metric, "increment") as mock_increment:
+            sink.process_batch_files(JSONLinesEncoding(compression="gzip"), [url])
+            sink.wait_for_drain()
+
+        assert threads and all(
+            thread.name == "elasticsearch-sink-test_stream" for thread in threads
+        )
+        assert sum(call.args[0] for call in mock_increment.call_args_list) == len(RECORDS)
+        sink.clean_up()
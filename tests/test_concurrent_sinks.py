@@ -0,0 +1,246 @@
+"""Tests for per-sink drain workers and the global in-flight bulk byte budget."""
+
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from target_elasticsearch.sinks import ElasticSink, InflightBytesBudget
+from target_elasticsearch.target import TargetElasticsearch
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+def _make_sink(concurrent_sinks=True, inflight_budget=None, stream_name="test_stream"):
+    """Create an ElasticSink with mocked target/client so no ES connection is needed."""
+    config = {
+        "scheme": "http",
+        "host": "localhost",
+        "port": 9200,
+        "request_timeout": 10,
+        "retry_on_timeout": True,
+        "index_format": "ecs-{{ stream_name }}-{{ current_timestamp_daily}}",
+        "concurrent_sinks": concurrent_sinks,
+        "sink_queue_size": 2,
+    }
+
+    mock_target = MagicMock()
+    mock_target.config = config
+    mock_target.inflight_budget = inflight_budget
+    mock_target._get_package_version.return_value = "0.0.0-test"
+
+    schema = {"properties": {"id": {"type": "string"}}}
+
+    with patch.object(ElasticSink, "_authenticated_client", return_value=MagicMock()):
+        sink = ElasticSink(
+            target=mock_target,
+            stream_name=stream_name,
+            schema=schema,
+            key_properties=None,
+        )
+    sink._client = MagicMock()
+    sink.index_name = "test-index"
+    return sink
+
+
+# ---------------------------------------------------------------------------
+# Test: drain worker
+# ---------------------------------------------------------------------------
+
+
+class TestDrainWorker:
+    """Verify batches are handed off to the sink's worker thread."""
+
+    def test_no_worker_by_default(self):
+        """Without `concurrent_sinks`, batches are written on the calling thread."""
+        sink = _make_sink(concurrent_sinks=False)
+        threads = []
+
+        def _bulk(client, actions):
+            threads.append(threading.current_thread())
+
+        with patch("target_elasticsearch.sinks.bulk", side_effect=_bulk):
+            sink.process_batch({"records": [{"id": "1"}]})
+
+        assert sink._drain_worker is None
+        assert threads == [threading.current_thread()]
+
+    def test_batches_written_by_worker(self):
+        """Queued batches are all written, in order, by the worker thread."""
+        sink = _make_sink()
+        written = []
+
+        def _bulk(client, actions):
+            written.append(([a["_source"]["id"] for a in actions], threading.current_thread().name))
+
+        with patch("target_elasticsearch.sinks.bulk", side_effect=_bulk):
+            for i in range(5):
+                sink.process_batch({"records": [{"id": str(i)}]})
+            sink.wait_for_drain()
+
+        assert [ids for ids, _ in written] == [[str(i)] for i in range(5)]
+        assert all(name == "elasticsearch-sink-test_stream" for _, name in written)
+        sink.clean_up()
+
+    def test_worker_error_reraised(self):
+        """A failure on the worker surfaces on the main thread."""
+        sink = _make_sink()
+
+        with patch("target_elasticsearch.sinks.bulk", side_effect=RuntimeError("boom")):
+            sink.process_batch({"records": [{"id": "1"}]})
+            with pytest.raises(RuntimeError, match="boom"):
+                sink.wait_for_drain()
+            with pytest.raises(RuntimeError, match="boom"):
+                sink.process_batch({"records": [{"id": "2"}]})
+
+    def test_slow_sink_does_not_block_other_sink(self):
+        """A sink stuck on a bulk request does not hold up batches of another sink."""
+        slow = _make_sink(stream_name="slow_stream")
+        fast = _make_sink(stream_name="fast_stream")
+        release = threading.Event()
+        fast_written = threading.Event()
+
+        def _bulk(client, actions):
+            if client is slow.client:
+                assert release.wait(5)
+            else:
+                fast_written.set()
+
+        with patch("target_elasticsearch.sinks.bulk", side_effect=_bulk):
+            slow.process_batch({"records": [{"id": "1"}]})
+            fast.process_batch({"records": [{"id": "2"}]})
+            assert fast_written.wait(1)
+            release.set()
+            slow.wait_for_drain()
+            fast.wait_for_drain()
+
+        slow.clean_up()
+        fast.clean_up()
+
+    def test_clean_up_stops_worker(self):
+        """clean_up flushes the queue, stops the worker and closes the client."""
+        sink = _make_sink()
+        worker = sink._drain_worker
+
+        with patch("target_elasticsearch.sinks.bulk") as mock_bulk:
+            sink.process_batch({"records": [{"id": "1"}]})
+            sink.clean_up()
+            assert mock_bulk.call_count == 1
+
+        assert not worker.is_alive()
+        sink.client.close.assert_called_once()
+
+
+# ---------------------------------------------------------------------------
+# Test: in-flight byte budget
+# ---------------------------------------------------------------------------
+
+
+class TestInflightBytesBudget:
+    """Verify the global cap on bulk bytes in flight."""
+
+    def test_acquire_blocks_until_release(self):
+        """A request that does not fit waits until enough bytes are released."""
+        budget = InflightBytesBudget(100)
+        budget.acquire(80)
+        acquired = threading.Event()
+
+        def _acquire():
+            budget.acquire(50)
+            acquired.set()
+
+        thread = threading.Thread(target=_acquire)
+        thread.start()
+        assert not acquired.wait(0.1)
+        budget.release(80)
+        assert acquired.wait(1)
+        thread.join()
+
+    def test_oversized_request_allowed_when_idle(self):
+        """A request larger than the budget proceeds when nothing else is in flight."""
+        budget = InflightBytesBudget(10)
+        budget.acquire(1000)
+        budget.release(1000)
+
+    def test_sink_acquires_and_releases_budget(self):
+        """The sink reserves the bulk body size around each request."""
+        budget = MagicMock(spec=InflightBytesBudget)
+        sink = _make_sink(inflight_budget=budget)
+
+        sink.client.bulk.return_value = {"errors": False, "items": []}
+
+        sink.process_batch({"records": [{"id": "1"}]})
+        sink.wait_for_drain()
+
+        body = sink.client.bulk.call_args.kwargs["operations"]
+        budget.acquire.assert_called_once_with(len(body))
+        budget.release.assert_called_once_with(len(body))
+        sink.clean_up()
+
+    def test_budget_applied_without_concurrent_sinks(self):
+        """The budget also caps bulk requests when the SDK drains sinks in parallel."""
+        budget = MagicMock(spec=InflightBytesBudget)
+        sink = _make_sink(concurrent_sinks=False, inflight_budget=budget)
+        sink.client.bulk.return_value = {"errors": False, "items": []}
+
+        sink.process_batch({"records": [{"id": "1"}]})
+
+        body = sink.client.bulk.call_args.kwargs["operations"]
+        budget.acquire.assert_called_once_with(len(body))
+        budget.release.assert_called_once_with(len(body))
+
+
+# ---------------------------------------------------------------------------
+# Test: target drain
+# ---------------------------------------------------------------------------
+
+
+class TestTargetDrain:
+    """Verify the target only emits state once every worker has written its batches."""
+
+    def test_state_written_after_workers_drained(self):
+        """A worker blocked on a bulk request holds back the STATE message."""
+        target = TargetElasticsearch(config={"concurrent_sinks": True, "verify_certs": False})
+        target._process_schema_message(
+            {
+                "type": "SCHEMA",
+                "stream": "users",
+                "schema": {"properties": {"id": {"type": "string"}}},
+                "key_properties": [],
+            }
+        )
+        release = threading.Event()
+        bulk_done = threading.Event()
+
+        def _bulk(client, actions):
+            assert release.wait(5)
+            bulk_done.set()
+
+        def _write_state(state):
+            assert bulk_done.is_set()
+            states.append(state)
+
+        states = []
+        with patch.object(
+            ElasticSink, "_authenticated_client", return_value=MagicMock()
+        ), patch.object(ElasticSink, "create_index"), patch(
+            "target_elasticsearch.sinks.bulk", side_effect=_bulk
+        ), patch.object(
+            target, "_write_state_message", side_effect=_write_state
+        ):
+            target._process_record_message(
+                {"type": "RECORD", "stream": "users", "record": {"id": "1"}}
+            )
+            target._process_state_message({"type": "STATE", "value": {"bookmarks": {"users": 1}}})
+            drain = threading.Thread(target=target.drain_all)
+            drain.start()
+            drain.join(0.2)
+            assert drain.is_alive()
+            assert states == []
+
+            release.set()
+            drain.join(5)
+            assert states == [{"bookmarks": {"users": 1}}]
+            target.drain_all(is_endofpipe=True)
@@ -0,0 +1,170 @@
+"""Tests for the persistent content hash index used to skip unchanged documents."""
+
+from unittest.mock import MagicMock, patch
+
+from target_elasticsearch.content_hash import ContentHashIndex, content_hash
+from target_elasticsearch.sinks import ElasticSink
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+def _make_sink(tmp_path, index_format="ecs-{{ stream_name }}"):
+    """Create a spooling ElasticSink with a content hash index and a mocked client."""
+    config = {
+        "scheme": "http",
+        "host": "localhost",
+        "port": 9200,
+        "request_timeout": 10,
+        "retry_on_timeout": True,
+        "index_format": index_format,
+        "metadata_fields": {"test_stream": {"_id": "id"}},
+        "content_hash_db": str(tmp_path / "hashes.sqlite"),
+        "spool_dir": str(tmp_path / "spool"),
+    }
+
+    mock_target = MagicMock()
+    mock_target.config = config
+    mock_target._get_package_version.return_value = "0.0.0-test"
+
+    schema = {"properties": {"id": {"type": "string"}}}
+
+    sink = ElasticSink(
+        target=mock_target,
+        stream_name="test_stream",
+        schema=schema,
+        key_properties=None,
+    )
+    sink._client = MagicMock()
+    return sink
+
+
+# ---------------------------------------------------------------------------
+# Test: hashing
+# ---------------------------------------------------------------------------
+
+
+class TestContentHash:
+    """Verify hashes are stable and content sensitive."""
+
+    def test_independent_of_key_order(self):
+        """The same document with keys in a different order hashes identically."""
+        assert content_hash({"a": 1, "b": {"c": 2, "d": 3}}) == content_hash(
+            {"b": {"d": 3, "c": 2}, "a": 1}
+        )
+
+    def test_sensitive_to_values(self):
+        """Any change in the document changes the hash."""
+        assert content_hash({"a": 1}) != content_hash({"a": 2})
+        assert content_hash({"a": 1}) != content_hash({"a": 1, "b": None})
+
+
+class TestContentHashIndex:
+    """Verify stored hashes are compared and persisted."""
+
+    def test_new_documents_changed(self, tmp_path):
+        """Documents never seen before are reported as changed."""
+        index = ContentHashIndex(str(tmp_path / "hashes.sqlite"))
+        hashes = {"1": content_hash({"a": 1}), "2": content_hash({"a": 2})}
+        assert index.changed("users", hashes) == hashes
+        index.close()
+
+    def test_unchanged_documents_skipped(self, tmp_path):
+        """Only documents whose hash differs from the stored one are returned."""
+        index = ContentHashIndex(str(tmp_path / "hashes.sqlite"))
+        index.update("users", {"1": content_hash({"a": 1}), "2": content_hash({"a": 2})})
+
+        hashes = {
+            "1": content_hash({"a": 1}),
+            "2": content_hash({"a": 20}),
+            "3": content_hash({"a": 3}),
+        }
+        assert set(index.changed("users", hashes)) == {"2", "3"}
+        index.close()
+
+    def test_keyed_on_index(self, tmp_path):
+        """The same `_id` in another index is a different document."""
+        index = ContentHashIndex(str(tmp_path / "hashes.sqlite"))
+        digest = content_hash({"a": 1})
+        index.update("users-2024", {"1": digest})
+        assert index.changed("users-2025", {"1": digest}) == {"1": digest}
+        index.close()
+
+    def test_persisted_across_connections(self, tmp_path):
+        """Hashes survive closing and reopening the database."""
+        path = str(tmp_path / "hashes.sqlite")
+        digest = content_hash({"a": 1})
+        first = ContentHashIndex(path)
+        first.update("users", {"1": digest})
+        first.close()
+
+        second = ContentHashIndex(path)
+        assert second.changed("users", {"1": digest}) == {}
+        second.close()
+
+    def test_large_lookup_chunked(self, tmp_path):
+        """Lookups larger than SQLite's parameter limit are split into chunks."""
+        index = ContentHashIndex(str(tmp_path / "hashes.sqlite"))
+        hashes = {str(i): content_hash({"i": i}) for i in range(2500)}
+        index.update("users", hashes)
+
+        hashes["1234"] = content_hash({"i": -1})
+        assert set(index.changed("users", hashes)) == {"1234"}
+        index.close()
+
+
+# ---------------------------------------------------------------------------
+# Test: spooled batches
+# ---------------------------------------------------------------------------
+
+
+class TestSpooledHashes:
+    """Verify hashes of spooled documents are stored only once they were indexed."""
+
+    def test_failed_documents_not_stored(self, tmp_path):
+        """Documents rejected in the spool drainer's bulk response are sent again."""
+        sink = _make_sink(tmp_path)
+        sink._client.bulk.return_value = {
+            "errors": True,
+            "items": [
+                {"index": {"_index": "ecs-test-stream", "_id": "1", "status": 201}},
+                {
+                    "index": {
+                        "_index": "ecs-test-stream",
+                        "_id": "2",
+                        "status": 400,
+                        "error": {"type": "mapper_parsing_exception"},
+                    }
+                },
+            ],
+        }
+
+        with patch.object(ElasticSink, "create_index"):
+            sink.process_batch({"records": [{"id": "1"}, {"id": "2"}]})
+            assert sink._spool.flush(timeout=5)
+            index = sink.index_name
+            hashes = {"1": content_hash({"id": "1"}), "2": content_hash({"id": "2"})}
+            assert set(sink._content_hashes.changed(index, hashes)) == {"2"}
+            sink.clean_up()
+
+
+# ---------------------------------------------------------------------------
+# Test: configuration
+# ---------------------------------------------------------------------------
+
+
+class TestDatedIndexWarning:
+    """Verify a dated index_format, which defeats the hash index, is reported."""
+
+    def test_warns_on_dated_index_format(self, tmp_path):
+        """Each day's index has its own hashes, so nothing would ever be skipped."""
+        sink = _make_sink(tmp_path, "ecs-{{ stream_name }}-{{ current_timestamp_daily}}")
+        warnings = [call.args[0] for call in sink.logger.warning.call_args_list]
+        assert any("current_timestamp_" in message for message in warnings)
+        sink.clean_up()
+
+    def test_no_warning_on_static_index_format(self, tmp_path):
+        sink = _make_sink(tmp_path)
+        sink.logger.warning.assert_not_called()
+        sink.clean_up()
@@ -69,9 +69,7 @@ class TestJsonPathParseCalledPerRecord:
         mapping = {"_id": "id", "category": "category"}
         record = {"id": "123", "name": "test", "category": "animals"}
 
-        with patch(
-            "target_elasticsearch.sinks.jsonpath_ng.parse", wraps=jsonpath_ng.parse
-        ) as mock_parse:
+        with patch("jsonpath_ng.parse", wraps=jsonpath_ng.parse) as mock_parse:
             # Call _build_fields 5 times (simulating 5 records) without compiled expressions
             for _ in range(5):
                 sink._build_fields(mapping, record)
@@ -88,9 +86,7 @@ class TestJsonPathParseCalledPerRecord:
         mapping = {"_id": "id"}
         records = [{"id": str(i), "name": f"test_{i}"} for i in range(100)]
 
-        with patch(
-            "target_elasticsearch.sinks.jsonpath_ng.parse", wraps=jsonpath_ng.parse
-        ) as mock_parse:
+        with patch("jsonpath_ng.parse", wraps=jsonpath_ng.parse) as mock_parse:
             for record in records:
                 sink._build_fields(mapping, record)
 
@@ -187,9 +183,7 @@ class TestCachingEliminatesParseCalls:
         # Pre-compile expressions (this calls parse once per key)
         compiled = {k: jsonpath_ng.parse(v) for k, v in mapping.items()}
 
-        with patch(
-            "target_elasticsearch.sinks.jsonpath_ng.parse", wraps=jsonpath_ng.parse
-        ) as mock_parse:
+        with patch("jsonpath_ng.parse", wraps=jsonpath_ng.parse) as mock_parse:
             # Call _build_fields with pre-compiled expressions
             for _ in range(100):
                 sink._build_fields(mapping, record, compiled=compiled)
@@ -208,9 +202,7 @@ class TestCachingEliminatesParseCalls:
         # Only pre-compile 2 of 3 keys
         compiled = {"_id": jsonpath_ng.parse("id"), "category": jsonpath_ng.parse("category")}
 
-        with patch(
-            "target_elasticsearch.sinks.jsonpath_ng.parse", wraps=jsonpath_ng.parse
-        ) as mock_parse:
+        with patch("jsonpath_ng.parse", wraps=jsonpath_ng.parse) as mock_parse:
             for _ in range(10):
                 sink._build_fields(mapping, record, compiled=compiled)
 
@@ -269,9 +261,7 @@ class TestSinkInitPreCompilation:
 
         records = [{"id": str(i), "name": f"record_{i}"} for i in range(50)]
 
-        with patch(
-            "target_elasticsearch.sinks.jsonpath_ng.parse", wraps=jsonpath_ng.parse
-        ) as mock_parse:
+        with patch("jsonpath_ng.parse", wraps=jsonpath_ng.parse) as mock_parse:
             sink.build_request_body_and_distinct_indices(records)
 
             # With caching, parse() should NOT be called during batch processing
@@ -324,18 +314,14 @@ class TestPerformanceCharacteristic:
         sink = _make_sink()
 
         # --- Uncached: parse() called per key per record ---
-        with patch(
-            "target_elasticsearch.sinks.jsonpath_ng.parse", wraps=jsonpath_ng.parse
-        ) as mock_parse:
+        with patch("jsonpath_ng.parse", wraps=jsonpath_ng.parse) as mock_parse:
             for record in records:
                 sink._build_fields(mapping, record)
             uncached_count = mock_parse.call_count
 
         # --- Cached: parse() called zero times during processing ---
         compiled = {k: jsonpath_ng.parse(v) for k, v in mapping.items()}
-        with patch(
-            "target_elasticsearch.sinks.jsonpath_ng.parse", wraps=jsonpath_ng.parse
-        ) as mock_parse:
+        with patch("jsonpath_ng.parse", wraps=jsonpath_ng.parse) as mock_parse:
             for record in records:
                 sink._build_fields(mapping, record, compiled=compiled)
             cached_count = mock_parse.call_count
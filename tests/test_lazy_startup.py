@@ -0,0 +1,116 @@
+"""Tests for deferred client creation and index setup in ElasticSink."""
+
+import subprocess
+import sys
+from unittest.mock import MagicMock, patch
+
+from target_elasticsearch.sinks import ElasticSink
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+def _make_sink(index_schema_fields=None):
+    """Create an ElasticSink with a mocked target."""
+    config = {
+        "scheme": "http",
+        "host": "localhost",
+        "port": 9200,
+        "request_timeout": 10,
+        "retry_on_timeout": True,
+        "index_format": "ecs-{{ stream_name }}-{{ current_timestamp_daily}}",
+        "index_schema_fields": {"test_stream": index_schema_fields or {}},
+    }
+
+    mock_target = MagicMock()
+    mock_target.config = config
+    mock_target._get_package_version.return_value = "0.0.0-test"
+
+    schema = {"properties": {"id": {"type": "string"}}}
+
+    return ElasticSink(
+        target=mock_target,
+        stream_name="test_stream",
+        schema=schema,
+        key_properties=None,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Test: client and index setup are deferred
+# ---------------------------------------------------------------------------
+
+
+class TestDeferredSetup:
+    """Verify no connection is made until a stream receives its first record."""
+
+    def test_no_client_until_first_use(self):
+        """Creating and setting up the sink does not connect to Elasticsearch."""
+        with patch.object(ElasticSink, "_authenticated_client") as mock_client:
+            sink = _make_sink()
+            sink.setup()
+            assert mock_client.call_count == 0
+            sink.clean_up()
+            assert mock_client.call_count == 0
+
+    def test_index_created_on_first_record_only(self):
+        """The static index is templated and created once, when the first record arrives."""
+        sink = _make_sink()
+        sink.setup()
+        assert sink.index_name is None
+
+        with patch.object(ElasticSink, "create_index") as mock_create:
+            context = {"records": []}
+            sink.process_record({"id": "1"}, context)
+            sink.process_record({"id": "2"}, context)
+
+        assert sink.index_name.startswith("ecs-test-stream-")
+        mock_create.assert_called_once_with(sink.index_name)
+
+    def test_index_prepared_for_batch_without_records(self):
+        """Batches that bypass `process_record`, such as BATCH messages, get the static index."""
+        sink = _make_sink()
+
+        sink._client = MagicMock()
+
+        with patch.object(ElasticSink, "create_index") as mock_create, patch(
+            "target_elasticsearch.sinks.bulk"
+        ) as mock_bulk:
+            sink.process_batch({"records": [{"id": "1"}]})
+
+        actions = mock_bulk.call_args[0][1]
+        assert actions[0]["_index"] == sink.index_name
+        assert sink.index_name.startswith("ecs-test-stream-")
+        mock_create.assert_called_with(sink.index_name)
+
+    def test_template_compiled_once(self):
+        """The index format template is compiled once and reused across records."""
+        sink = _make_sink(index_schema_fields={"ts": "created_at"})
+
+        first = sink._template_index({"ts": "2024-01-02"})
+        template = sink._index_template
+        second = sink._template_index({"ts": "2024-01-03"})
+
+        assert first == second
+        assert sink._index_template is template
+
+
+# ---------------------------------------------------------------------------
+# Test: optional modules are imported lazily
+# ---------------------------------------------------------------------------
+
+
+def test_sinks_import_does_not_load_template_modules():
+    """Importing the sink module adds none of the template modules to what the SDK loads."""
+    code = (
+        "import sys, elasticsearch.helpers, singer_sdk.sinks; "
+        "loaded = set(sys.modules); "
+        "import target_elasticsearch.sinks; "
+        "print(','.join(m for m in ('jinja2', 'jsonpath_ng', 'dateutil.parser') "
+        "if m in sys.modules and m not in loaded))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
@@ -0,0 +1,134 @@
+"""Tests for compiled per-stream field projections."""
+
+import pytest
+
+from target_elasticsearch.projection import compile_projection
+
+RECORD = {
+    "id": "1",
+    "email": "a@example.com",
+    "password": "secret",
+    "nickname": None,
+    "address": {"city": "Lyon", "zip": None, "geo": {"lat": 45.7, "lon": 4.8}},
+    "tags": ["a", "b"],
+}
+
+
+class TestTopLevelProjection:
+    """Projections on top-level keys."""
+
+    @pytest.mark.parametrize("spec", [None, {}, {"flatten": False}])
+    def test_noop_spec_compiles_to_none(self, spec):
+        """Specs that leave records unchanged add no per-record work."""
+        assert compile_projection(spec) is None
+
+    def test_include(self):
+        """Only included keys are kept, in include order, skipping absent ones."""
+        project = compile_projection({"include": ["email", "id", "missing"]})
+        assert project(RECORD) == {"email": "a@example.com", "id": "1"}
+
+    def test_exclude(self):
+        """Excluded keys are dropped, everything else is kept as is."""
+        project = compile_projection({"exclude": ["password", "address"]})
+        assert project(RECORD) == {
+            "id": "1",
+            "email": "a@example.com",
+            "nickname": None,
+            "tags": ["a", "b"],
+        }
+
+    def test_include_and_exclude(self):
+        """Exclusion wins over inclusion."""
+        project = compile_projection({"include": ["id", "password"], "exclude": ["password"]})
+        assert project(RECORD) == {"id": "1"}
+
+    def test_rename_and_drop_nulls(self):
+        """Keys are renamed and null values dropped in the same pass."""
+        project = compile_projection(
+            {
+                "include": ["id", "nickname", "email"],
+                "rename": {"id": "user_id"},
+                "drop_nulls": True,
+            }
+        )
+        assert project(RECORD) == {"user_id": "1", "email": "a@example.com"}
+
+    def test_record_not_mutated(self):
+        """The input record is left untouched so metadata fields can still read it."""
+        project = compile_projection({"exclude": ["password"]})
+        project(RECORD)
+        assert "password" in RECORD
+
+    def test_unknown_option_rejected(self):
+        """Typos in the spec are reported instead of silently ignored."""
+        with pytest.raises(ValueError, match="inclde"):
+            compile_projection({"inclde": ["id"]})
+
+    @pytest.mark.parametrize(
+        "spec,option",
+        [
+            ({"include": "id"}, "include"),
+            ({"exclude": "password"}, "exclude"),
+            ({"include": ["id", 1]}, "include"),
+            ({"rename": ["id"]}, "rename"),
+            ({"rename": {"id": 1}}, "rename"),
+        ],
+    )
+    def test_malformed_option_rejected(self, spec, option):
+        """A bare string is not taken as the set of its characters, nor other wrong types."""
+        with pytest.raises(ValueError, match=option):
+            compile_projection(spec)
+
+
+class TestFlatteningProjection:
+    """Projections with nested objects flattened into dotted keys."""
+
+    def test_flatten(self):
+        """Nested objects become separator-joined keys, lists are kept as values."""
+        project = compile_projection({"flatten": True})
+        assert project(RECORD) == {
+            "id": "1",
+            "email": "a@example.com",
+            "password": "secret",
+            "nickname": None,
+            "address.city": "Lyon",
+            "address.zip": None,
+            "address.geo.lat": 45.7,
+            "address.geo.lon": 4.8,
+            "tags": ["a", "b"],
+        }
+
+    def test_flatten_with_separator_and_drop_nulls(self):
+        """A custom separator is used and nested nulls are dropped."""
+        project = compile_projection(
+            {"flatten": True, "flatten_separator": "_", "drop_nulls": True, "include": ["address"]}
+        )
+        assert project(RECORD) == {
+            "address_city": "Lyon",
+            "address_geo_lat": 45.7,
+            "address_geo_lon": 4.8,
+        }
+
+    def test_include_nested_key(self):
+        """A nested key can be included without keeping its siblings."""
+        project = compile_projection({"flatten": True, "include": ["id", "address.geo.lat"]})
+        assert project(RECORD) == {"id": "1", "address.geo.lat": 45.7}
+
+    def test_exclude_prefix(self):
+        """Excluding a prefix drops every key below it."""
+        project = compile_projection(
+            {"flatten": True, "include": ["address"], "exclude": ["address.geo"]}
+        )
+        assert project(RECORD) == {"address.city": "Lyon", "address.zip": None}
+
+    def test_rename_flattened_key(self):
+        """Renames refer to flattened keys."""
+        project = compile_projection(
+            {"flatten": True, "include": ["address.city"], "rename": {"address.city": "city"}}
+        )
+        assert project(RECORD) == {"city": "Lyon"}
+
+    def test_empty_object_kept(self):
+        """An empty nested object is kept as a value rather than disappearing."""
+        project = compile_projection({"flatten": True})
+        assert project({"id": "1", "meta": {}}) == {"id": "1", "meta": {}}
@@ -0,0 +1,416 @@
+"""Tests for the write-ahead disk spool, including crash recovery."""
+
+import os
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import elasticsearch
+import pytest
+
+from target_elasticsearch import spool as spool_module
+from target_elasticsearch.sinks import ElasticSink, FlushDeadline
+from target_elasticsearch.spool import DiskSpool
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+class _Recorder:
+    """Send callback recording payloads, optionally failing the first calls."""
+
+    def __init__(self, failures=0, fail_after=None):
+        self.payloads = []
+        self.failures = failures
+        self.fail_after = fail_after
+        self.lock = threading.Lock()
+
+    def __call__(self, payload):
+        with self.lock:
+            if self.failures or len(self.payloads) == self.fail_after:
+                self.failures = max(self.failures - 1, 0)
+                raise ConnectionError("cluster unavailable")
+            self.payloads.append(bytes(payload))
+
+
+def _segments(directory):
+    """Return the paths of all segment files, oldest instance first."""
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names
+        if name.endswith(".seg")
+    )
+
+
+def _crash(spool):
+    """Drop a spool's file handles without closing it, as a killed process would."""
+    if spool._active_file is not None:
+        spool._active_file.close()
+    for _, lock_fd in spool._adopted:
+        os.close(lock_fd)
+    os.close(spool._lock_fd)
+
+
+# ---------------------------------------------------------------------------
+# Test: normal operation
+# ---------------------------------------------------------------------------
+
+
+class TestDiskSpool:
+    """Verify payloads are replayed in order and acknowledged segments removed."""
+
+    def test_payloads_replayed_in_order(self, tmp_path):
+        """Every appended payload is sent once, in append order."""
+        sent = _Recorder()
+        spool = DiskSpool(str(tmp_path), sent)
+        spool.start()
+        for i in range(20):
+            spool.append(f"payload-{i}".encode())
+
+        assert spool.flush(timeout=5)
+        spool.close()
+        assert sent.payloads == [f"payload-{i}".encode() for i in range(20)]
+
+    def test_acknowledged_segments_deleted(self, tmp_path):
+        """Sealed segments are removed once all of their frames are acknowledged."""
+        sent = _Recorder()
+        spool = DiskSpool(str(tmp_path), sent, segment_bytes=64)
+        spool.start()
+        for i in range(10):
+            spool.append(b"x" * 40)
+
+        assert spool.flush(timeout=5)
+        spool.close()
+        assert len(sent.payloads) == 10
+        assert _segments(tmp_path) == []
+        assert spool.pending_bytes == 0
+
+    def test_failed_sends_retried(self, tmp_path, monkeypatch):
+        """A send failure keeps the frame spooled and it is retried until acknowledged."""
+        monkeypatch.setattr(spool_module, "RETRY_BACKOFF_INITIAL", 0.01)
+        sent = _Recorder(failures=3)
+        spool = DiskSpool(str(tmp_path), sent)
+        spool.start()
+        spool.append(b"first")
+        spool.append(b"second")
+
+        assert spool.flush(timeout=5)
+        spool.close()
+        assert sent.payloads == [b"first", b"second"]
+
+    def test_non_retryable_failure_set_aside(self, tmp_path):
+        """A frame failing with a non-retryable error is moved aside and draining continues."""
+        sent = _Recorder(failures=1)
+        spool = DiskSpool(str(tmp_path), sent, retryable=lambda error: False)
+        spool.start()
+        spool.append(b"rejected")
+        spool.append(b"accepted")
+
+        assert spool.flush(timeout=5)
+        spool.close()
+        assert sent.payloads == [b"accepted"]
+        rejected = os.listdir(tmp_path / "rejected")
+        assert len(rejected) == 1
+        assert (tmp_path / "rejected" / rejected[0]).read_bytes() == b"rejected"
+        assert _segments(tmp_path) == []
+
+    def test_partial_failure_retried(self, tmp_path, monkeypatch):
+        """Only the part of a frame the send callback hands back is sent again."""
+        monkeypatch.setattr(spool_module, "RETRY_BACKOFF_INITIAL", 0.01)
+        sent = []
+
+        def _send(payload):
+            sent.append(bytes(payload))
+            return b"b" if payload == b"a+b" else None
+
+        spool = DiskSpool(str(tmp_path), _send)
+        spool.start()
+        spool.append(b"a+b")
+        spool.append(b"c")
+
+        assert spool.flush(timeout=5)
+        spool.close()
+        assert sent == [b"a+b", b"b", b"c"]
+
+    def test_flush_times_out_while_cluster_down(self, tmp_path, monkeypatch):
+        """flush gives up after the timeout and the data stays on disk."""
+        monkeypatch.setattr(spool_module, "RETRY_BACKOFF_INITIAL", 0.01)
+        sent = _Recorder(failures=10**6)
+        spool = DiskSpool(str(tmp_path), sent)
+        spool.start()
+        spool.append(b"kept")
+
+        assert not spool.flush(timeout=0.1)
+        spool.close()
+        assert _segments(tmp_path) != []
+
+
+# ---------------------------------------------------------------------------
+# Test: crash recovery
+# ---------------------------------------------------------------------------
+
+
+class TestCrashRecovery:
+    """Verify a new spool resumes what a crashed one left behind."""
+
+    def test_unsent_payloads_replayed_after_restart(self, tmp_path):
+        """Payloads appended before a crash are replayed by the next spool."""
+        crashed = DiskSpool(str(tmp_path), _Recorder())
+        for i in range(5):
+            crashed.append(f"payload-{i}".encode())
+        # No drainer was started and close() is never called.
+        _crash(crashed)
+
+        sent = _Recorder()
+        recovered = DiskSpool(str(tmp_path), sent)
+        recovered.start()
+        assert recovered.flush(timeout=5)
+        recovered.close()
+        assert sent.payloads == [f"payload-{i}".encode() for i in range(5)]
+
+    def test_acknowledged_frames_not_replayed(self, tmp_path, monkeypatch):
+        """Only frames after the persisted acknowledgement are replayed."""
+        monkeypatch.setattr(spool_module, "RETRY_BACKOFF_INITIAL", 0.01)
+        first = _Recorder(fail_after=2)
+        stopped = DiskSpool(str(tmp_path), first)
+        stopped.start()
+        for payload in (b"acked-1", b"acked-2", b"pending"):
+            stopped.append(payload)
+        assert not stopped.flush(timeout=0.2)
+        stopped.close()
+
+        sent = _Recorder()
+        recovered = DiskSpool(str(tmp_path), sent)
+        recovered.start()
+        assert recovered.flush(timeout=5)
+        recovered.close()
+        assert first.payloads == [b"acked-1", b"acked-2"]
+        assert sent.payloads == [b"pending"]
+
+    def test_torn_frame_truncated(self, tmp_path):
+        """A partially written frame at the tail is discarded on recovery."""
+        crashed = DiskSpool(str(tmp_path), _Recorder())
+        crashed.append(b"complete")
+        _crash(crashed)
+        with open(_segments(tmp_path)[-1], "ab") as f:
+            f.write(b"\x10\x00\x00\x00\x00\x00\x00\x00torn")
+
+        sent = _Recorder()
+        recovered = DiskSpool(str(tmp_path), sent)
+        recovered.start()
+        assert recovered.flush(timeout=5)
+        recovered.close()
+        assert sent.payloads == [b"complete"]
+
+    def test_corrupt_frame_truncated(self, tmp_path):
+        """A frame whose checksum does not match is discarded with everything after it."""
+        crashed = DiskSpool(str(tmp_path), _Recorder())
+        crashed.append(b"good")
+        crashed.append(b"flipped")
+        _crash(crashed)
+        with open(_segments(tmp_path)[-1], "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"X")
+
+        sent = _Recorder()
+        recovered = DiskSpool(str(tmp_path), sent)
+        recovered.start()
+        assert recovered.flush(timeout=5)
+        recovered.close()
+        assert sent.payloads == [b"good"]
+
+    def test_new_segments_continue_sequence(self, tmp_path):
+        """Appends after recovery go to a new segment ordered after the recovered ones."""
+        crashed = DiskSpool(str(tmp_path), _Recorder())
+        crashed.append(b"old")
+        _crash(crashed)
+
+        sent = _Recorder()
+        recovered = DiskSpool(str(tmp_path), sent)
+        recovered.append(b"new")
+        assert len(_segments(tmp_path)) == 2
+        recovered.start()
+        assert recovered.flush(timeout=5)
+        recovered.close()
+        assert sent.payloads == [b"old", b"new"]
+
+
+# ---------------------------------------------------------------------------
+# Test: spools sharing a directory
+# ---------------------------------------------------------------------------
+
+
+class TestSharedDirectory:
+    """Verify several open spools on one directory never touch each other's segments."""
+
+    def test_live_instance_not_recovered(self, tmp_path, monkeypatch):
+        """A second spool leaves the segments of a spool that is still open alone."""
+        monkeypatch.setattr(spool_module, "RETRY_BACKOFF_INITIAL", 0.01)
+        first_sent = _Recorder(failures=10**6)
+        first = DiskSpool(str(tmp_path), first_sent)
+        first.start()
+        first.append(b"first")
+        assert not first.flush(timeout=0.1)
+
+        second_sent = _Recorder()
+        second = DiskSpool(str(tmp_path), second_sent)
+        second.start()
+        second.append(b"second")
+        assert second.flush(timeout=5)
+        second.close()
+
+        assert second_sent.payloads == [b"second"]
+        assert len(_segments(tmp_path)) == 1
+        first_sent.failures = 0
+        assert first.flush(timeout=5)
+        first.close()
+        assert first_sent.payloads == [b"first"]
+        assert _segments(tmp_path) == []
+
+    def test_closed_instance_recovered_once(self, tmp_path, monkeypatch):
+        """Segments left by a closed spool are adopted by exactly one later spool."""
+        monkeypatch.setattr(spool_module, "RETRY_BACKOFF_INITIAL", 0.01)
+        stopped = DiskSpool(str(tmp_path), _Recorder(failures=10**6))
+        stopped.start()
+        stopped.append(b"pending")
+        stopped.close()
+
+        adopter_sent = _Recorder(failures=10**6)
+        adopter = DiskSpool(str(tmp_path), adopter_sent)
+        other_sent = _Recorder()
+        other = DiskSpool(str(tmp_path), other_sent)
+        other.start()
+        assert other.flush(timeout=5)
+        other.close()
+        assert other_sent.payloads == []
+
+        adopter_sent.failures = 0
+        adopter.start()
+        assert adopter.flush(timeout=5)
+        adopter.close()
+        assert adopter_sent.payloads == [b"pending"]
+        assert os.listdir(tmp_path) == []
+
+
+# ---------------------------------------------------------------------------
+# Test: spooled bulk requests from the sink
+# ---------------------------------------------------------------------------
+
+
+def _make_sink(tmp_path, stream_name="test_stream", flush_deadline=None):
+    """Create a spooling ElasticSink with a mocked target and client."""
+    config = {
+        "scheme": "http",
+        "host": "localhost",
+        "port": 9200,
+        "request_timeout": 10,
+        "retry_on_timeout": True,
+        "index_format": "ecs-{{ stream_name }}",
+        "metadata_fields": {stream_name: {"_id": "id"}},
+        "spool_dir": str(tmp_path),
+    }
+
+    mock_target = MagicMock()
+    mock_target.config = config
+    mock_target.spool_flush_deadline = flush_deadline
+    mock_target._get_package_version.return_value = "0.0.0-test"
+
+    sink = ElasticSink(
+        target=mock_target,
+        stream_name=stream_name,
+        schema={"properties": {"id": {"type": "string"}}},
+        key_properties=None,
+    )
+    sink._client = MagicMock()
+    return sink
+
+
+class TestSpooledBulkFailures:
+    """Verify documents failing inside a successful bulk response are handled per status."""
+
+    def _item(self, document_id, status):
+        result = {"_index": "ecs-test-stream", "_id": document_id, "status": status}
+        if status >= 300:
+            result["error"] = {"type": "es_rejected_execution_exception"}
+        return {"index": result}
+
+    def test_throttled_documents_retried(self, tmp_path, monkeypatch):
+        """Documents rejected with 429 or 5xx are sent again, alone, until indexed."""
+        monkeypatch.setattr(spool_module, "RETRY_BACKOFF_INITIAL", 0.01)
+        sink = _make_sink(tmp_path)
+        sink._client.bulk.side_effect = [
+            {"errors": True, "items": [self._item("1", 201), self._item("2", 429)]},
+            {"errors": True, "items": [self._item("2", 503)]},
+            {"errors": False, "items": [self._item("2", 201)]},
+        ]
+
+        with patch.object(ElasticSink, "create_index"):
+            sink.process_batch({"records": [{"id": "1"}, {"id": "2"}]})
+            assert sink._spool.flush(timeout=5)
+            sink.clean_up()
+
+        bodies = [call.kwargs["operations"] for call in sink._client.bulk.call_args_list]
+        assert len(bodies) == 3
+        assert b'"_id":"1"' in bodies[0] and b'"_id":"2"' in bodies[0]
+        assert bodies[1] == bodies[2]
+        assert b'"_id":"1"' not in bodies[1] and b'"_id":"2"' in bodies[1]
+        assert bodies[1].count(b"\n") == 2
+
+    def test_rejected_documents_not_retried(self, tmp_path):
+        """Documents failing with a client error are logged and the frame acknowledged."""
+        sink = _make_sink(tmp_path)
+        sink._client.bulk.return_value = {"errors": True, "items": [self._item("1", 400)]}
+
+        with patch.object(ElasticSink, "create_index"):
+            sink.process_batch({"records": [{"id": "1"}]})
+            assert sink._spool.flush(timeout=5)
+            sink.clean_up()
+
+        assert sink._client.bulk.call_count == 1
+
+
+class TestFlushDeadline:
+    """Verify sinks share one deadline for draining their spools at the end of a run."""
+
+    def test_clock_starts_on_first_use(self):
+        deadline = FlushDeadline(10)
+        assert deadline.remaining() == pytest.approx(10, abs=0.5)
+        assert FlushDeadline(None).remaining() is None
+
+    def test_sinks_share_deadline(self, tmp_path, monkeypatch):
+        """With the cluster down, closing several sinks waits once for the timeout, not per sink."""
+        monkeypatch.setattr(spool_module, "RETRY_BACKOFF_INITIAL", 0.01)
+        deadline = FlushDeadline(0.3)
+        sinks = [
+            _make_sink(tmp_path, stream_name=f"stream_{i}", flush_deadline=deadline)
+            for i in range(6)
+        ]
+
+        start = time.monotonic()
+        with patch.object(
+            ElasticSink, "create_index", side_effect=elasticsearch.ConnectionError("down")
+        ):
+            for sink in sinks:
+                sink.process_batch({"records": [{"id": "1"}]})
+            for sink in sinks:
+                sink.clean_up()
+
+        assert time.monotonic() - start < 1.0
+        assert len(_segments(tmp_path)) == 6
+
+
+class TestRetryableSpoolError:
+    """Verify which failures of a spooled bulk body the sink retries."""
+
+    @pytest.mark.parametrize("status,retryable", [(429, True), (503, True), (400, False)])
+    def test_api_errors(self, status, retryable):
+        error = elasticsearch.ApiError("failed", meta=MagicMock(status=status), body={})
+        assert ElasticSink._retryable_spool_error(error) is retryable
+
+    def test_transport_errors_retried(self):
+        assert ElasticSink._retryable_spool_error(elasticsearch.ConnectionError("down"))
+
+    def test_other_errors_not_retried(self):
+        assert not ElasticSink._retryable_spool_error(ValueError("bad payload"))